@@ -1,5 +1,23 @@
+import argparse
+try:
+    import audioop
+except ImportError:  # Python 3.13+, same fallback pydub uses
+    import pyaudioop as audioop
+import collections
+import functools
+import hashlib
+import io
+import json
+import multiprocessing
 import os
+import random
+import re
 import subprocess  # For checking ffmpeg
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+from google.api_core import exceptions as google_exceptions
 from google.cloud import texttospeech
 from pydub import AudioSegment
 from pydub.generators import Sine
@@ -8,190 +26,755 @@ from pydub.playback import play
 # Path to your service account key JSON file
 os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = 'put your json key file here'  # Replace with your actual path
 
+# Sentence delimiter and pause-marker -> <break> table per language; override with ssml_rules.json
+DEFAULT_SSML_RULES = {
+    "te-IN": {
+        "sentence_delimiter": "।",  # Telugu full stop (। - U+0964)
+        "pause_markers": {
+            "(4 సెకన్ల పాటు శ్వాసలోకి తీసుకోండి)": "4s",
+            "(2 సెకన్ల పాటు ఆపి ఉంచండి)": "2s",
+            "(6 సెకన్ల పాటు ఊపిరి బయటకి వదలండి)": "6s",
+            "(4 సెకన్ల పాటు)": "4s",
+            "(2 సెకన్ల పాటు)": "2s",
+            "(6 సెకన్ల పాటు)": "6s",
+        },
+    },
+}
+
+# Errors worth retrying: rate limits (429 / RESOURCE_EXHAUSTED) and transient server or network failures
+TRANSIENT_TTS_ERRORS = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+    ConnectionError,
+    TimeoutError,
+)
+
+# Largest per-sample difference from the legacy assembly accepted by --benchmark-assembly (gain and fade rounding)
+BENCHMARK_MAX_SAMPLE_DIFFERENCE = 16
+
+# MP3 bitrate of the final voiceover, shared by the in-memory export and the streaming encoder
+OUTPUT_BITRATE = "192k"
+
+
+class TTSCache:
+    """Content-addressed on-disk cache of synthesized audio.
+
+    Each entry is stored as <sha256>.audio in cache_dir, keyed by the SSML text
+    plus the voice and audio settings, so re-rendering an edited script only
+    pays for the chunks that actually changed. Least recently used entries are
+    evicted once the cache grows past max_bytes.
+    """
 
-def generate_telugu_voiceover(telugu_text, output_filename="telugu_meditation_voiceover.mp3"):
+    def __init__(self, cache_dir="tts_cache", max_bytes=500 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(ssml_chunk, voice, audio_config):
+        """Hashes the SSML text together with every setting that changes the rendered audio."""
+        parts = [
+            ssml_chunk,
+            voice.language_code,
+            voice.name,
+            str(int(audio_config.audio_encoding)),
+            str(audio_config.sample_rate_hertz),
+            repr(float(audio_config.speaking_rate)),
+            repr(float(audio_config.pitch)),
+        ]
+        return hashlib.sha256("\x1f".join(parts).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.audio")
+
+    def get(self, key):
+        """Returns the cached audio bytes for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                audio_content = f.read()
+            os.utime(path)  # Mark as recently used for LRU eviction
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return audio_content
+
+    def put(self, key, audio_content):
+        """Stores audio bytes under key and evicts old entries if the cache is over budget."""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(audio_content)
+        os.replace(tmp_path, path)  # Atomic, so concurrent renders never see a partial entry
+        self.evict()
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes."""
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith('.audio'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total_size <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total_size -= size
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        """Returns hit/miss counters and the hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+def check_ffmpeg():
+    """Returns True if ffmpeg is installed and on the PATH."""
+    try:
+        subprocess.run(["ffmpeg", "-version"], check=True, capture_output=True)
+        print("FFmpeg is installed and accessible.")
+        return True
+    except FileNotFoundError:
+        print("Error: FFmpeg is not installed or not in your system's PATH.")
+        print("Please follow the instructions at https://github.com/jiaaro/pydub#dependencies to install FFmpeg.")
+        return False
+
+
+def make_voice_config():
+    """Returns the (VoiceSelectionParams, AudioConfig) pair used for every voiceover."""
+    # Configure voice and audio (same as before)
+    voice = texttospeech.VoiceSelectionParams(
+        language_code='te-IN',  # Telugu (India)
+        name='te-IN-Standard-A',  # REPLACE WITH A VALID TELUGU VOICE FROM GOOGLE CLOUD. Double check that voice is still there and valid!
+        ssml_gender=texttospeech.SsmlVoiceGender.FEMALE # Make sure the voice is female
+    )
+
+    audio_config = texttospeech.AudioConfig(
+        audio_encoding=texttospeech.AudioEncoding.LINEAR16,  # WAV/PCM decodes in-process, no ffmpeg spawn per chunk
+        sample_rate_hertz=24000,
+        speaking_rate=0.85,  # Adjust as needed for best sound
+        pitch=-2.0          # Adjust as needed for best sound
+    )
+    return voice, audio_config
+
+
+def text_to_ssml_chunks(telugu_text):
+    """Splits a script into <speak> SSML chunks that fit the TTS request size limit."""
+    # Split the text into chunks smaller than 5000 bytes (adjust as needed)
+    max_chunk_size = 4000  # Reduced max_chunk_size for more buffer
+    text_chunks = split_text_into_chunks(telugu_text, max_chunk_size)
+    return [f'<speak>{chunk}</speak>' for chunk in text_chunks] #readd now that we have a proper function
+
+
+@functools.lru_cache(maxsize=4)
+def load_background_sound(background_filename="waves_crashing.mp3"):
+    """Loads the background loop once per process, or returns None if the file is missing."""
+    try:
+        # Ensure the wave file exists locally before attemtping to add background
+        return AudioSegment.from_file(background_filename, format="mp3")
+    except FileNotFoundError:
+        print(f"Background music file '{background_filename}' not found. Proceeding without background music")
+        return None
+
+
+def render_voiceover(audio_contents, audio_encoding, output_filename, background_filename="waves_crashing.mp3"):
+    """Decodes the synthesized chunks, mixes them with the background and exports the MP3.
+
+    Only takes plain bytes/ints/strings, so it can run in a worker process.
+    """
+    audio_segments = []
+    for i, audio_content in enumerate(audio_contents):
+        # Decode the audio segment straight from the response bytes, nothing touches the disk
+        audio_segment = decode_audio_content(audio_content, audio_encoding)
+        audio_segments.append(audio_segment)
+        print(f'Audio segment {i+1} decoded ({len(audio_segment)} ms)')
+
+    # Voice, looped background (-10 dB, 3 s fades) and 30 seconds of relaxing silence, mixed in one buffer
+    combined_audio = assemble_voiceover(audio_segments, load_background_sound(background_filename))
+
+    # Export the combined audio to the output file
+    combined_audio.export(output_filename, format="mp3", bitrate=OUTPUT_BITRATE)
+    print(f'Combined audio written to file "{output_filename}"')
+    return len(combined_audio)
+
+
+def generate_telugu_voiceover(telugu_text, output_filename="telugu_meditation_voiceover.mp3", max_workers=4, client=None, cache_dir="tts_cache", streaming=False):
     """Generates a calm and soothing Telugu voiceover using Google Cloud TTS API,
     handling long text by splitting it into chunks.
 
     Args:
         telugu_text: The Telugu text to convert to speech.
         output_filename: The name of the output MP3 file.
+        max_workers: Number of chunks synthesized concurrently (1 = one after another).
+        client: Optional TTS client exposing synthesize_speech(); a TextToSpeechClient is created if omitted.
+        cache_dir: Directory of the synthesized audio cache, or None to always call the API.
+        streaming: Mix block by block and pipe PCM into one ffmpeg encoder while chunks are
+            still being synthesized, keeping peak memory constant regardless of script length.
     """
     try:
         # Check if ffmpeg is installed
-        try:
-            subprocess.run(["ffmpeg", "-version"], check=True, capture_output=True)
-            print("FFmpeg is installed and accessible.")
-        except FileNotFoundError:
-            print("Error: FFmpeg is not installed or not in your system's PATH.")
-            print("Please follow the instructions at https://github.com/jiaaro/pydub#dependencies to install FFmpeg.")
+        if not check_ffmpeg():
             return  # Exit if FFmpeg is not found
 
         # Instantiates a client
-        client = texttospeech.TextToSpeechClient()
+        if client is None:
+            client = texttospeech.TextToSpeechClient()
+
+        voice, audio_config = make_voice_config()
+        ssml_chunks = text_to_ssml_chunks(telugu_text)
+        cache = TTSCache(cache_dir) if cache_dir else None
+
+        results = iter_synthesized_chunks(client, ssml_chunks, voice, audio_config, max_workers=max_workers, cache=cache)
+
+        if streaming:
+            # Each chunk is mixed and handed to the encoder as soon as it (and every chunk before it) is ready
+            background_sound = load_background_sound()
+            frame_rate = audio_config.sample_rate_hertz
+            channels = 1
+            if background_sound is not None:
+                frame_rate = max(frame_rate, background_sound.frame_rate)
+                channels = max(channels, background_sound.channels)
+            mixer = StreamingMixer(output_filename, frame_rate, channels, background_sound)
+            try:
+                for i, result in enumerate(results):
+                    audio_segment = decode_audio_content(result["audio_content"], audio_config.audio_encoding)
+                    mixer.write(audio_segment)
+                    print(f'Audio segment {i+1} streamed to encoder ({len(audio_segment)} ms)')
+            except BaseException:
+                mixer.abort()
+                raise
+            mixer.close()
+            print(f'Combined audio written to file "{output_filename}"')
+        else:
+            audio_contents = [result["audio_content"] for result in results]
+            render_voiceover(audio_contents, audio_config.audio_encoding, output_filename)
+
+        if cache:
+            stats = cache.stats()
+            print(f"TTS cache: {stats['hits']} hit(s), {stats['misses']} miss(es)")
 
-        # Configure voice and audio (same as before)
-        voice = texttospeech.VoiceSelectionParams(
-            language_code='te-IN',  # Telugu (India)
-            name='te-IN-Standard-A',  # REPLACE WITH A VALID TELUGU VOICE FROM GOOGLE CLOUD. Double check that voice is still there and valid!
-            ssml_gender=texttospeech.SsmlVoiceGender.FEMALE # Make sure the voice is female
-        )
+    except Exception as e:
+        print(f"Error generating voiceover: {e}")
 
-        audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.MP3,
-            speaking_rate=0.85,  # Adjust as needed for best sound
-            pitch=-2.0          # Adjust as needed for best sound
-        )
 
-        # Split the text into chunks smaller than 5000 bytes (adjust as needed)
-        max_chunk_size = 4000  # Reduced max_chunk_size for more buffer
-        text_chunks = split_text_into_chunks(telugu_text, max_chunk_size)
+def load_batch_jobs(source, output_dir=None):
+    """Builds the job list for run_batch from a directory of *.txt scripts or a JSON manifest.
 
-        audio_segments = []
-        for i, chunk in enumerate(text_chunks):
+    A manifest is a list of {"script": "path/to/script.txt", "output": "path/to/out.mp3"}
+    objects; "output" is optional. Outputs default to <output_dir>/<script name>.mp3.
+    """
+    if os.path.isdir(source):
+        entries = [{"script": os.path.join(source, name)} for name in sorted(os.listdir(source)) if name.endswith('.txt')]
+        base_dir = source
+    else:
+        with open(source, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        base_dir = os.path.dirname(os.path.abspath(source))
+
+    jobs = []
+    for entry in entries:
+        script_path = os.path.join(base_dir, entry["script"]) if not os.path.isabs(entry["script"]) else entry["script"]
+        name = os.path.splitext(os.path.basename(script_path))[0]
+        output_filename = entry.get("output") or os.path.join(output_dir or base_dir, f"{name}.mp3")
+        jobs.append({"name": name, "script": script_path, "output": output_filename})
+    return jobs
+
+
+def run_batch(jobs, summary_filename="batch_summary.json", max_workers=4, render_processes=None, client=None, cache_dir="tts_cache"):
+    """Renders many voiceovers with one shared TTS client and one ffmpeg check.
+
+    Synthesis (network-bound) runs in this process on the shared client, one job
+    after another, while decoding, mixing and MP3 encoding (CPU-bound) are handed
+    to a process pool, so job N renders while job N+1 is still being synthesized.
+    A JSON summary with per-job timings is written to summary_filename.
 
-            ssml_chunk = f'<speak>{chunk}</speak>' #readd now that we have a proper function
-            # Set the text input to be synthesized
-            synthesis_input = texttospeech.SynthesisInput(ssml=ssml_chunk)  # use ssml instead of text
+    Args:
+        jobs: Dicts with "name", "script" and "output" keys, e.g. from load_batch_jobs().
+        summary_filename: Where to write the per-job result summary.
+        max_workers: Concurrent TTS requests per job.
+        render_processes: Size of the render process pool (defaults to the CPU count).
+        client: Optional shared TTS client; a TextToSpeechClient is created if omitted.
+        cache_dir: Directory of the synthesized audio cache, or None to always call the API.
+    """
+    if not check_ffmpeg():
+        return []
 
-            # Perform text-to-speech request
-            response = client.synthesize_speech(
-                input=synthesis_input, voice=voice, audio_config=audio_config
-            )
+    if client is None:
+        client = texttospeech.TextToSpeechClient()
+    voice, audio_config = make_voice_config()
+    cache = TTSCache(cache_dir) if cache_dir else None
+    batch_start = time.perf_counter()
+
+    summary = []
+    pending = []
+    # Spawned, not forked: the shared TTS client has live gRPC threads by the time the first render is submitted
+    with ProcessPoolExecutor(max_workers=render_processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+        for job in jobs:
+            result = {"name": job["name"], "script": job["script"], "output": job["output"], "status": "ok", "error": None}
+            summary.append(result)
+            try:
+                with open(job["script"], 'r', encoding='utf-8') as f:
+                    telugu_text = f.read()
+                start = time.perf_counter()
+                chunk_results = synthesize_chunks(client, text_to_ssml_chunks(telugu_text), voice, audio_config,
+                                                  max_workers=max_workers, cache=cache)
+                result["chunks"] = len(chunk_results)
+                result["cached_chunks"] = sum(1 for chunk in chunk_results if chunk["cached"])
+                result["synthesis_seconds"] = round(time.perf_counter() - start, 3)
+                audio_contents = [chunk["audio_content"] for chunk in chunk_results]
+                future = pool.submit(render_voiceover, audio_contents, int(audio_config.audio_encoding), job["output"])
+                pending.append((result, future, time.perf_counter()))
+            except Exception as e:
+                result["status"], result["error"] = "failed", str(e)
+                print(f"Job '{job['name']}' failed during synthesis: {e}")
+
+        for result, future, submitted in pending:
+            try:
+                result["duration_ms"] = future.result()
+            except Exception as e:
+                result["status"], result["error"] = "failed", str(e)
+                print(f"Job '{result['name']}' failed during rendering: {e}")
+            # Includes time spent queued behind other renders
+            result["render_seconds"] = round(time.perf_counter() - submitted, 3)
+
+    with open(summary_filename, 'w', encoding='utf-8') as f:
+        json.dump({"total_seconds": round(time.perf_counter() - batch_start, 3), "jobs": summary}, f, ensure_ascii=False, indent=2)
+    succeeded = sum(1 for result in summary if result["status"] == "ok")
+    print(f"Batch finished: {succeeded}/{len(summary)} job(s) succeeded. Summary written to \"{summary_filename}\"")
+    return summary
+
+
+def assemble_voiceover(audio_segments, background_sound=None, background_gain_db=-10.0, fade_duration=3000, silence_duration=30000):
+    """Mixes the voice segments, looped background and trailing silence in linear time.
+
+    A single NumPy sample buffer sized to the known total duration is preallocated
+    and every segment is written into it in place. The background is tiled by
+    indexing rather than repeated doubling, and the gain, fades and overlay are
+    vectorized, so nothing is copied once per segment the way AudioSegment += does.
+
+    Args:
+        audio_segments: Decoded voice segments, in order.
+        background_sound: Optional AudioSegment looped underneath the voice.
+        background_gain_db: Gain applied to the background (negative = quieter).
+        fade_duration: Background fade-in/fade-out length in milliseconds.
+        silence_duration: Silence appended after the voice in milliseconds.
+    """
+    # Match pydub's overlay behaviour: mix at the highest frame rate / channel count involved
+    sources = list(audio_segments) + ([background_sound] if background_sound is not None else [])
+    if not sources:
+        return AudioSegment.silent(duration=silence_duration)
+    frame_rate = max(segment.frame_rate for segment in sources)
+    channels = max(segment.channels for segment in sources)
+
+    # One resampler across all segments, so the voice is resampled as if it had been joined first
+    resampler = VoiceResampler(frame_rate, channels)
+    voice_samples = [resampler.convert(segment) for segment in audio_segments]
+    voice_frames = sum(len(samples) for samples in voice_samples)
+    silence_frames = int(frame_rate * silence_duration / 1000)
+
+    pcm = np.zeros((voice_frames + silence_frames, channels), dtype=np.int16)
+    offset = 0
+    for samples in voice_samples:
+        pcm[offset:offset + len(samples)] = samples
+        offset += len(samples)
+
+    if background_sound is not None and voice_frames:
+        background = segment_to_samples(background_sound, frame_rate, channels)
+        if len(background):
+            gain = 10 ** (background_gain_db / 20)
+            fade_frames = max(1, int(frame_rate * fade_duration / 1000))
+            # Mix in fixed-size blocks so temporaries stay small on hour-long sessions
+            block_frames = frame_rate * 10
+            for block_start in range(0, voice_frames, block_frames):
+                block_end = min(block_start + block_frames, voice_frames)
+                mix_background_block(pcm[block_start:block_end], block_start, background, gain, fade_frames, voice_frames)
+
+    return AudioSegment(data=pcm.tobytes(), sample_width=2, frame_rate=frame_rate, channels=channels)
+
+
+def segment_to_samples(segment, frame_rate, channels):
+    """Returns an AudioSegment as a (frames, channels) int16 array in the given format."""
+    segment = segment.set_frame_rate(frame_rate).set_channels(channels).set_sample_width(2)
+    return np.frombuffer(segment.raw_data, dtype=np.int16).reshape(-1, channels)
+
+
+class VoiceResampler:
+    """Converts consecutive voice segments to one output format.
+
+    The audioop.ratecv state is carried across segment boundaries, so the
+    concatenated output is sample-identical to joining the segments first and
+    resampling once (which is what pydub's overlay did in the old path).
+    Converting each segment on its own restarts the filter at every chunk.
+    """
+
+    def __init__(self, frame_rate, channels):
+        self.frame_rate = frame_rate
+        self.channels = channels
+        self._input_rate = None
+        self._state = None
+
+    def convert(self, segment):
+        """Returns the next segment as a (frames, channels) int16 array."""
+        # Same order as pydub's _sync: channels, then frame rate
+        segment = segment.set_channels(self.channels).set_sample_width(2)
+        data = segment.raw_data
+        if segment.frame_rate != self._input_rate:
+            self._input_rate, self._state = segment.frame_rate, None
+        if segment.frame_rate != self.frame_rate:
+            data, self._state = audioop.ratecv(data, 2, self.channels, segment.frame_rate, self.frame_rate, self._state)
+        return np.frombuffer(data, dtype=np.int16).reshape(-1, self.channels)
 
-            # Save the audio segment to a file
-            segment_filename = f"segment_{i}.mp3"
-            with open(segment_filename, 'wb') as out:
-                out.write(response.audio_content)
-            print(f'Audio segment {i+1} written to file "{segment_filename}"')
 
-            # Load the audio segment using pydub
-            audio_segment = AudioSegment.from_mp3(segment_filename)
-            audio_segments.append(audio_segment)
+def mix_background_block(voice_block, block_start, background, gain, fade_frames, voice_frames=None):
+    """Mixes the looped, faded background into a block of voice samples in place.
 
-        # Concatenate all audio segments
+    Args:
+        voice_block: (frames, channels) int16 voice samples, modified in place.
+        block_start: Absolute frame position of the block within the voice track.
+        background: (frames, channels) int16 background loop.
+        gain: Linear background gain.
+        fade_frames: Length of the fade-in and fade-out in frames.
+        voice_frames: Total voice length in frames, or None while it is not known yet
+            (the caller must then keep the block clear of the fade-out).
+    """
+    positions = np.arange(block_start, block_start + len(voice_block))
+    # Tile the loop by indexing instead of doubling the background
+    looped = background[positions % len(background)].astype(np.float32)
+    envelope = np.clip(positions / fade_frames, 0.0, 1.0)
+    if voice_frames is not None:
+        envelope = np.minimum(envelope, np.clip((voice_frames - positions) / fade_frames, 0.0, 1.0))
+    mixed = voice_block.astype(np.float32) + looped * (gain * envelope).astype(np.float32)[:, None]
+    voice_block[:] = np.clip(mixed, -32768, 32767)
+
+
+class StreamingMixer:
+    """Mixes voice segments block by block and pipes the PCM into a single
+    long-lived ffmpeg encoder over stdin.
+
+    Only the background loop and the last fade_duration of voice are held in
+    memory: that tail is kept back until close(), when the total length (and
+    therefore where the fade-out starts) is finally known.
+    """
+
+    def __init__(self, output_filename, frame_rate, channels, background_sound=None, background_gain_db=-10.0,
+                 fade_duration=3000, bitrate=OUTPUT_BITRATE):
+        self.output_filename = output_filename
+        self.frame_rate = frame_rate
+        self.channels = channels
+        self.gain = 10 ** (background_gain_db / 20)
+        self.fade_frames = max(1, int(frame_rate * fade_duration / 1000))
+        self.background = None
+        if background_sound is not None:
+            self.background = segment_to_samples(background_sound, frame_rate, channels)
+            if not len(self.background):
+                self.background = None
+        self._resampler = VoiceResampler(frame_rate, channels)
+        self._position = 0  # Voice frames already sent to the encoder
+        self._pending = np.zeros((0, channels), dtype=np.int16)
+        self._process = subprocess.Popen(
+            ["ffmpeg", "-loglevel", "error", "-f", "s16le", "-ar", str(frame_rate), "-ac", str(channels),
+             "-i", "pipe:0", "-codec:a", "libmp3lame", "-b:a", bitrate, "-y", output_filename],
+            stdin=subprocess.PIPE, stderr=subprocess.PIPE,
+        )
+
+    def _emit(self, samples, voice_frames=None):
+        if self.background is not None and len(samples):
+            mix_background_block(samples, self._position, self.background, self.gain, self.fade_frames, voice_frames)
+        self._process.stdin.write(samples.tobytes())
+        self._position += len(samples)
+
+    def write(self, segment):
+        """Mixes a voice segment and sends everything but the fade-out tail to the encoder."""
+        samples = self._resampler.convert(segment)
+        self._pending = np.concatenate([self._pending, samples])
+        ready = len(self._pending) - self.fade_frames
+        if ready > 0:
+            self._emit(self._pending[:ready].copy())
+            self._pending = self._pending[ready:].copy()
+
+    def close(self, silence_duration=30000):
+        """Flushes the voice tail with its fade-out, appends the silence and finalizes the file."""
+        voice_frames = self._position + len(self._pending)
+        self._emit(self._pending.copy(), voice_frames)
+        self._pending = np.zeros((0, self.channels), dtype=np.int16)
+        silence_frames = int(self.frame_rate * silence_duration / 1000)
+        block_frames = self.frame_rate * 10
+        for block_start in range(0, silence_frames, block_frames):
+            block = min(block_frames, silence_frames - block_start)
+            self._process.stdin.write(bytes(block * self.channels * 2))
+        self._process.stdin.close()
+        stderr = self._process.stderr.read()
+        if self._process.wait() != 0:
+            raise RuntimeError(f"ffmpeg encoder failed: {stderr.decode(errors='replace').strip()}")
+
+    def abort(self):
+        """Stops the encoder without finalizing, e.g. when synthesis fails mid-stream."""
+        self._process.kill()
+        self._process.wait()
+
+
+def benchmark_assembly(durations_minutes=(5, 15, 30, 60), segment_seconds=20):
+    """Times the old AudioSegment += assembly against assemble_voiceover on synthetic audio,
+    and checks that both produce the same samples (up to gain/fade rounding).
+
+    Run with: python audio_voiceover_telugu.py --benchmark-assembly
+    """
+    def legacy_assembly(audio_segments, background_sound):
         combined_audio = AudioSegment.empty()
         for segment in audio_segments:
             combined_audio += segment
+        background_sound = background_sound - 10
+        while len(background_sound) < len(combined_audio):
+            background_sound += background_sound
+        background_sound = background_sound[:len(combined_audio)].fade_in(3000).fade_out(3000)
+        return combined_audio.overlay(background_sound) + AudioSegment.silent(duration=30000)
+
+    def max_sample_difference(a, b, block=1 << 22):
+        length = min(len(a.raw_data), len(b.raw_data)) // 2
+        a = np.frombuffer(a.raw_data, dtype=np.int16)[:length]
+        b = np.frombuffer(b.raw_data, dtype=np.int16)[:length]
+        return max((int(np.abs(a[i:i + block].astype(np.int32) - b[i:i + block]).max()) for i in range(0, length, block)), default=0)
+
+    # Slightly different tones per segment, so a discontinuity at a chunk boundary would show up in the comparison
+    tones = [Sine(220 + 17 * i).to_audio_segment(duration=segment_seconds * 1000).set_frame_rate(24000).set_sample_width(2) for i in range(4)]
+    background_sound = Sine(110).to_audio_segment(duration=45000).set_frame_rate(44100).set_channels(2).set_sample_width(2)
+    print(f"{'minutes':>8} {'segments':>9} {'legacy (s)':>11} {'numpy (s)':>10} {'speedup':>8} {'max diff':>9} {'frames':>7}")
+    for minutes in durations_minutes:
+        audio_segments = [tones[i % len(tones)] for i in range(max(1, int(minutes * 60 / segment_seconds)))]
+        start = time.perf_counter()
+        legacy = legacy_assembly(audio_segments, background_sound)
+        legacy_time = time.perf_counter() - start
+        start = time.perf_counter()
+        assembled = assemble_voiceover(audio_segments, background_sound)
+        numpy_time = time.perf_counter() - start
+        # Equivalence: the largest per-sample difference (gain/fade rounding only) and the difference in length in frames
+        difference = max_sample_difference(legacy, assembled)
+        frame_difference = int(assembled.frame_count()) - int(legacy.frame_count())
+        print(f"{minutes:>8} {len(audio_segments):>9} {legacy_time:>11.2f} {numpy_time:>10.2f} {legacy_time / numpy_time:>7.1f}x {difference:>9} {frame_difference:>+7}")
+        if difference > BENCHMARK_MAX_SAMPLE_DIFFERENCE:
+            print(f"  WARNING: output differs from the legacy path by up to {difference} (allowed {BENCHMARK_MAX_SAMPLE_DIFFERENCE})")
+
+def decode_audio_content(audio_content, audio_encoding):
+    """Decodes TTS response bytes into an AudioSegment through an in-memory buffer.
+
+    LINEAR16 responses carry a WAV header and are parsed by pydub directly;
+    other encodings (e.g. MP3) are piped to ffmpeg without a temporary file.
+    """
+    buffer = io.BytesIO(audio_content)
+    if audio_encoding == texttospeech.AudioEncoding.LINEAR16:
+        return AudioSegment.from_wav(buffer)
+    if audio_encoding == texttospeech.AudioEncoding.OGG_OPUS:
+        return AudioSegment.from_file(buffer, format="ogg")
+    return AudioSegment.from_file(buffer, format="mp3")
+
 
-        # Load background music (replace with your file path)
+def synthesize_chunk(client, ssml_chunk, voice, audio_config, max_retries=5, base_delay=1.0):
+    """Synthesizes a single SSML chunk, retrying rate limits and transient errors
+    with exponential backoff and jitter.
+
+    Returns:
+        A (response, attempts) tuple.
+    """
+    # Set the text input to be synthesized
+    synthesis_input = texttospeech.SynthesisInput(ssml=ssml_chunk)  # use ssml instead of text
+    for attempt in range(1, max_retries + 1):
         try:
-            # Ensure the wave file exists locally before attemtping to add background
-            background_sound = AudioSegment.from_file("waves_crashing.mp3", format="mp3")
+            response = client.synthesize_speech(
+                input=synthesis_input, voice=voice, audio_config=audio_config
+            )
+            return response, attempt
+        except TRANSIENT_TTS_ERRORS as e:
+            if attempt == max_retries:
+                raise
+            delay = base_delay * (2 ** (attempt - 1)) + random.uniform(0, base_delay)
+            print(f"Transient TTS error ({e}), retrying in {delay:.1f}s (attempt {attempt}/{max_retries})")
+            time.sleep(delay)
+
+
+def synthesize_chunks(client, ssml_chunks, voice, audio_config, max_workers=4, max_retries=5, base_delay=1.0, cache=None):
+    """Synthesizes SSML chunks on a bounded thread pool.
+
+    Results come back in the same order as ssml_chunks no matter which request
+    finishes first, so the voiceover is always assembled deterministically.
+    When a TTSCache is given it is consulted before each API call.
+
+    Returns:
+        A list of dicts with the chunk index, the audio bytes, the latency in
+        seconds (including retries), the number of attempts and whether the
+        chunk came from the cache.
+    """
+    return list(iter_synthesized_chunks(client, ssml_chunks, voice, audio_config, max_workers, max_retries, base_delay, cache))
+
+
+def iter_synthesized_chunks(client, ssml_chunks, voice, audio_config, max_workers=4, max_retries=5, base_delay=1.0, cache=None):
+    """Like synthesize_chunks, but yields each result (in order) as soon as it is ready,
+    so downstream mixing and encoding can overlap with the remaining requests."""
+    def run(indexed_chunk):
+        i, ssml_chunk = indexed_chunk
+        start = time.perf_counter()
+        key = cache.make_key(ssml_chunk, voice, audio_config) if cache else None
+        audio_content = cache.get(key) if cache else None
+        if audio_content is not None:
+            latency = time.perf_counter() - start
+            print(f"Chunk {i+1}/{len(ssml_chunks)} loaded from cache")
+            return {"index": i, "audio_content": audio_content, "latency": latency, "attempts": 0, "cached": True}
+        response, attempts = synthesize_chunk(client, ssml_chunk, voice, audio_config, max_retries, base_delay)
+        if cache:
+            cache.put(key, response.audio_content)
+        latency = time.perf_counter() - start
+        print(f"Chunk {i+1}/{len(ssml_chunks)} synthesized in {latency:.2f}s ({attempts} attempt(s))")
+        return {"index": i, "audio_content": response.audio_content, "latency": latency, "attempts": attempts, "cached": False}
+
+    # Only about max_workers requests run ahead of the consumer, so a slow chunk cannot
+    # make finished audio for the rest of the script pile up in memory.
+    max_workers = max(1, max_workers)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = collections.deque()
+        for indexed_chunk in enumerate(ssml_chunks):
+            if len(pending) >= max_workers:
+                yield pending.popleft().result()
+            pending.append(executor.submit(run, indexed_chunk))
+        while pending:
+            yield pending.popleft().result()
+
+
+def load_ssml_rules(language_code="te-IN", path="ssml_rules.json"):
+    """Returns the sentence delimiter and pause-marker table for a language.
+
+    The table is read from the JSON file at path when it exists (same layout as
+    DEFAULT_SSML_RULES), so new languages and markers need no code changes.
+    """
+    rules = DEFAULT_SSML_RULES
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            rules = json.load(f)
+    return rules[language_code]
 
-            # Adjust the volume of the background music to be subtle
-            background_sound = background_sound - 10  # Make it less negative to increase sound
 
-             # Make background_sound at least as long as combined_audio
-            while len(background_sound) < len(combined_audio):
-                 background_sound += background_sound #doubling the sound
+def compile_pause_markers(pause_markers):
+    """Compiles a marker -> break duration table into a function that rewrites
+    every marker to an SSML <break> tag in one regex pass."""
+    if not pause_markers:
+        return lambda text: text
+    breaks = {marker: f'<break time="{duration}"/>' for marker, duration in pause_markers.items()}
+    # Longest markers first, so "(4 సెకన్ల పాటు శ్వాసలోకి తీసుకోండి)" wins over "(4 సెకన్ల పాటు)"
+    pattern = re.compile("|".join(re.escape(marker) for marker in sorted(breaks, key=len, reverse=True)))
+    return lambda text: pattern.sub(lambda match: breaks[match.group(0)], text)
 
-            # Trim background_sound to match the duration of combined_audio
-            background_sound = background_sound[:len(combined_audio)]
 
-            # Apply a fade-in and fade-out to the background sound, and also add some sound in front
-            fade_duration = 3000  # 3 seconds
-            background_sound = background_sound.fade_in(fade_duration).fade_out(fade_duration)
+def split_text_into_chunks(text, max_chunk_size, rules=None, verbose=False):
+    """Splits a string into chunks smaller than max_chunk_size bytes,
+    trying to split at sentence boundaries if possible.  Handles sentences longer than max_chunk_size.
 
-            # Overlay voiceover on background sound
-            combined_audio = combined_audio.overlay(background_sound)
+    Pause markers are rewritten to SSML breaks in a single compiled pass over the
+    whole text, and chunk byte lengths are tracked incrementally instead of
+    re-encoding the growing chunk for every sentence.
 
-        except FileNotFoundError:
-            print("Background music file 'waves_crashing.mp3' not found. Proceeding without background music")
+    Args:
+        text: The script to split.
+        max_chunk_size: Upper bound (exclusive) on the UTF-8 size of each chunk.
+        rules: Sentence delimiter and pause markers, as returned by load_ssml_rules().
+        verbose: Print every sentence and chunk as it is processed.
+    """
+    if rules is None:
+        rules = load_ssml_rules()
+    delimiter = rules["sentence_delimiter"]
+    delimiter_length = len(delimiter.encode('utf-8'))
+    rewrite = compile_pause_markers(rules["pause_markers"])
 
-        #Silence of 30 seconds for relaxing time
-        silence_duration=30000 #30 seconds
-        silent_segment = AudioSegment.silent(duration=silence_duration)
+    chunks = []
+    current_parts = []
+    current_length = 0
+
+    def flush():
+        if current_parts:
+            chunks.append("".join(current_parts))
+            if verbose:
+                print(f"Chunk added. Length (bytes): {current_length}")
+
+    # Use this for the SSML tags, this step is EXTREMELY IMPORTANT
+    for sentence in rewrite(text).split(delimiter):
+        if not sentence:
+            continue
+        sentence_length = len(sentence.encode('utf-8'))
+        if verbose:
+            print(f"Sentence: '{sentence}', Length (bytes): {sentence_length}")
+
+        if sentence_length + delimiter_length < max_chunk_size:  # Sentence fits within the limit
+            pieces = [(sentence + delimiter, sentence_length + delimiter_length)]
+        else:  # Sentence is too long - MUST SPLIT IT
+            if verbose:
+                print("Long sentence detected. Splitting further...")
+            sub_sentences = split_long_sentence(sentence, max_chunk_size - delimiter_length)
+            sub_sentences[-1] += delimiter
+            pieces = [(sub_sentence, len(sub_sentence.encode('utf-8'))) for sub_sentence in sub_sentences]
+
+        for piece, piece_length in pieces:
+            if current_length + piece_length >= max_chunk_size:
+                flush()
+                current_parts, current_length = [], 0
+            current_parts.append(piece)
+            current_length += piece_length
+
+    flush()
+    return chunks
 
-        # Append the audio segment and the loop to the combined audio and export to combine
-        combined_audio += silent_segment#Combine audio and silence snippets
 
-        # Export the combined audio to the output file
-        combined_audio.export(output_filename, format="mp3")
-        print(f'Combined audio written to file "{output_filename}"')
+def split_long_sentence(sentence, max_chunk_size):
+    """Splits a long sentence into smaller sub-sentences or phrases."""
+    sub_sentences = []
+    current_words = []
+    current_length = 0
 
-        # Clean up individual segment files (optional)
-        for i in range(len(text_chunks)):
-            segment_filename = f"segment_{i}.mp3"
-            os.remove(segment_filename)
-            print(f"Deleted segment file {segment_filename}")
+    for word in sentence.split():  # split at spaces
+        word_length = len(word.encode('utf-8')) + 1  # Word plus its trailing space
 
-    except Exception as e:
-        print(f"Error generating voiceover: {e}")
+        if current_words and current_length + word_length >= max_chunk_size:
+            sub_sentences.append("".join(current_words))
+            current_words, current_length = [], 0
+        current_words.append(word + " ")
+        current_length += word_length
 
+    if current_words:
+        sub_sentences.append("".join(current_words))
 
-def split_text_into_chunks(text, max_chunk_size):
-    """Splits a string into chunks smaller than max_chunk_size bytes,
-    trying to split at sentence boundaries if possible.  Handles sentences longer than max_chunk_size."""
-    chunks = []
-    current_chunk = ""
-    sentences = text.split("।")  # Split at Telugu full stop (। - U+0964)
-
-    for sentence in sentences:
-         # Use this for the SSML tags, this step is EXTREMELY IMPORTANT
-        sentence = sentence.replace('(4 సెకన్ల పాటు శ్వాసలోకి తీసుకోండి)', '<break time="4s"/>')
-        sentence = sentence.replace('(2 సెకన్ల పాటు ఆపి ఉంచండి)', '<break time="2s"/>')
-        sentence = sentence.replace('(6 సెకన్ల పాటు ఊపిరి బయటకి వదలండి)', '<break time="6s"/>')
-        sentence = sentence.replace('(4 సెకన్ల పాటు)', '<break time="4s"/>') #added this too
-        sentence = sentence.replace('(2 సెకన్ల పాటు)', '<break time="2s"/>')#added this too
-        sentence = sentence.replace('(6 సెకన్ల పాటు)', '<break time="6s"/>')#added this too
-
-        encoded_sentence = sentence.encode('utf-8')
-        sentence_length = len(encoded_sentence)
-
-        print(f"Sentence: '{sentence}', Length (bytes): {sentence_length}")
-
-        if sentence_length < max_chunk_size:  # Sentence fits within the limit
-            if len(current_chunk.encode('utf-8')) + sentence_length < max_chunk_size:
-                current_chunk += sentence + "।"
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk)
-                    print(f"Chunk added. Length (bytes): {len(current_chunk.encode('utf-8'))}")
-                current_chunk = sentence + "।"
-        else:  # Sentence is too long - MUST SPLIT IT
-            print(f"Long sentence detected. Splitting further...")
-            sub_sentences = split_long_sentence(sentence, max_chunk_size) #Split at smaller intervals
+    return sub_sentences or [""]
 
-            for sub_sentence in sub_sentences:
-                encoded_sub_sentence = sub_sentence.encode('utf-8')
-                sub_sentence_length = len(encoded_sub_sentence)
 
-                if len(current_chunk.encode('utf-8')) + sub_sentence_length < max_chunk_size:
-                    current_chunk += sub_sentence
-                else:
-                    if current_chunk:
-                        chunks.append(current_chunk)
-                        print(f"Chunk added. Length (bytes): {len(current_chunk.encode('utf-8'))}")
-                    current_chunk = sub_sentence
+def benchmark_chunking(script_bytes=1024 * 1024, max_chunk_size=4000):
+    """Times split_text_into_chunks on a synthetic script of about script_bytes.
 
-        if current_chunk:
-            chunks.append(current_chunk)
-            print(f"Final chunk added. Length (bytes): {len(current_chunk.encode('utf-8'))}")
+    Run with: python audio_voiceover_telugu.py --benchmark-chunking
+    """
+    rules = load_ssml_rules()
+    sentences = ["మెల్లగా ఊపిరి వదిలేయండి... (6 సెకన్ల పాటు ఊపిరి బయటకి వదలండి)",
+                 "లోతుగా శ్వాస తీసుకోండి… (4 సెకన్ల పాటు) ఆపి ఉంచండి… (2 సెకన్ల పాటు)",
+                 "ఇప్పుడు మీ శరీరాన్ని పూర్తిగా విశ్రాంతి కలిగించండి"]
+    unit = rules["sentence_delimiter"].join(sentences) + rules["sentence_delimiter"]
+    text = unit * max(1, script_bytes // len(unit.encode('utf-8')))
+    text_length = len(text.encode('utf-8'))
+
+    start = time.perf_counter()
+    chunks = split_text_into_chunks(text, max_chunk_size, rules)
+    elapsed = time.perf_counter() - start
+    print(f"Chunked {text_length / 1e6:.2f} MB into {len(chunks)} chunks in {elapsed * 1000:.1f} ms "
+          f"({text_length / 1e6 / elapsed:.1f} MB/s)")
 
-    return chunks
 
-def split_long_sentence(sentence, max_chunk_size):
-     """Splits a long sentence into smaller sub-sentences or phrases."""
-     sub_sentences = []
-     current_sub_sentence = ""
-     words = sentence.split() #split at spaces
-
-     for word in words:
-          encoded_word = word.encode('utf-8')
-          word_length = len(encoded_word)
-
-          if len(current_sub_sentence.encode('utf-8')) + word_length < max_chunk_size:
-               current_sub_sentence += word + " " #Add word and space
-          else:
-               if current_sub_sentence:
-                    sub_sentences.append(current_sub_sentence)
-               current_sub_sentence = word + " " #start new sub sentence
-
-     if current_sub_sentence:
-          sub_sentences.append(current_sub_sentence)
-
-     return sub_sentences
 #add your own lyrics here
 if __name__ == "__main__":
     telugu_meditation_script = """
@@ -263,4 +846,21 @@ if __name__ == "__main__":
 ఈ ప్రశాంతతను మీ రోజంతా కొనసాగించండి.
 """
 
-    generate_telugu_voiceover(telugu_meditation_script)
+    parser = argparse.ArgumentParser(description="Generate Telugu meditation voiceovers with Google Cloud TTS.")
+    parser.add_argument("--stream", action="store_true", help="mix and encode while chunks are still being synthesized")
+    parser.add_argument("--batch", metavar="DIR_OR_MANIFEST", help="render every *.txt script in a directory or every entry of a JSON manifest")
+    parser.add_argument("--output-dir", help="where batch outputs go (defaults to next to the scripts)")
+    parser.add_argument("--summary", default="batch_summary.json", help="per-job batch result summary file")
+    parser.add_argument("--render-processes", type=int, help="size of the batch render process pool (defaults to CPU count)")
+    parser.add_argument("--benchmark-assembly", action="store_true", help="compare assembly strategies and exit")
+    parser.add_argument("--benchmark-chunking", action="store_true", help="time chunking of a 1 MB script and exit")
+    args = parser.parse_args()
+
+    if args.benchmark_assembly:
+        benchmark_assembly()
+    elif args.benchmark_chunking:
+        benchmark_chunking()
+    elif args.batch:
+        run_batch(load_batch_jobs(args.batch, args.output_dir), args.summary, render_processes=args.render_processes)
+    else:
+        generate_telugu_voiceover(telugu_meditation_script, streaming=args.stream)
@@ -1,68 +1,175 @@
 # news.py
 # FINAL VERSION: Integrated LLM for high-quality narration, all other logic preserved.
 
-import os, logging, shutil, tempfile, re, subprocess, requests, math, random, asyncio, edge_tts, configparser, html, sys
-from bs4 import BeautifulSoup
-from playwright.sync_api import sync_playwright
-from PIL import Image, ImageDraw, ImageFont
+import os, logging, shutil, tempfile, re, subprocess, requests, math, random, asyncio, configparser, html, sys, time, json, importlib.util, sqlite3, hashlib, struct, threading, io, multiprocessing, functools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from contextlib import closing
 from urllib.parse import urljoin
-from groq import Groq # Import Groq
-
-try:
-    import spacy
-    from matplotlib import font_manager
-except ImportError:
+# Heavy libraries (spaCy, matplotlib, playwright, groq, edge_tts, PIL, bs4) are imported by the stage that first needs them,
+# so a run that finds no new articles exits without paying for them. Only check here that they are installed.
+if any(importlib.util.find_spec(name) is None for name in ["spacy", "matplotlib", "playwright", "groq", "edge_tts", "PIL", "bs4"]):
     print("FATAL ERROR: A required library is not installed.")
     sys.exit(1)
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - [%(filename)s] - %(message)s')
 logger = logging.getLogger(__name__)
 
-VIDEO_WIDTH, VIDEO_HEIGHT = 1080, 1920; HEADLINES_LIMIT = 1; MIN_CLIP_DURATION = 1; USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36"; FONT_PATH, NLP_MODEL, UNSPLASH_API_KEY, GROQ_API_KEY = None, None, None, None; VOICE = "en-US-AriaNeural"; HISTORY_FILE, DESCRIPTION_FILE, LAST_SEGMENT_FILE, CONFIG_FILE = "processed_urls.txt", "video_description.txt", "last_segment.txt", "config.ini"; FPS = 24; OUTRO_GIF_NAME = "snap_feed.gif"
+VIDEO_WIDTH, VIDEO_HEIGHT = 1080, 1920; HEADLINES_LIMIT = 1; MIN_CLIP_DURATION = 1; USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36"; FONT_PATH, NLP_MODEL, UNSPLASH_API_KEY, GROQ_API_KEY = None, None, None, None; VOICE = "en-US-AriaNeural"; HISTORY_FILE, DESCRIPTION_FILE, LAST_SEGMENT_FILE, CONFIG_FILE, FONT_CACHE_FILE = "processed_urls.txt", "video_description.txt", "last_segment.txt", "config.ini", "font_cache.txt"; HISTORY_DB_FILE, HISTORY_TTL_DAYS = "processed_urls.db", 90; FPS = 24; OUTRO_GIF_NAME = "snap_feed.gif"
+MP3_SAMPLE_RATES = [44100, 48000, 32000]  # MPEG-1; halved for MPEG-2, quartered for MPEG-2.5
+MP3_BITRATES = {(True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448], (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384], (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320], (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256], (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160], (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]}
+TTS_MAX_CONCURRENCY, TTS_MAX_RETRIES, TTS_SEED, TTS_SERVICE, TTS_SERVICE_LOCK = 4, 3, None, None, threading.Lock()
+UNSPLASH_SEARCH_URL, TEXT_AREA_HEIGHT, IMAGE_AREA_HEIGHT = "https://api.unsplash.com/search/photos", 1100, VIDEO_HEIGHT - 1100
+HEADLINE_FONT_SIZE, HEADLINE_MIN_FONT_SIZE, HEADLINE_FONT_STEP, SUMMARY_FONT_SIZE, HEADLINE_TOP, HEADLINE_MAX_WIDTH, SUMMARY_MAX_WIDTH, SUMMARY_GAP = 90, 60, 6, 60, 150, 980, 950, 60
+LAYOUT_KERNING_SLACK = 0.05  # Fraction of the font size within which a cumulative-width estimate is re-measured exactly
+# Composed cards go to the encoder as raw RGB (no PNG encode here, no per-frame PNG decode in ffmpeg's looped input) or as fast-compressed PNG
+CARD_FORMAT, CARD_PNG_COMPRESS_LEVEL, CARD_BACKGROUND, CARD_CANVAS = "raw", 1, '#181818', None
+IMAGE_CACHE_DIR, IMAGE_CACHE_TTL_DAYS, IMAGE_CACHE_MAX_BYTES, IMAGE_JPEG_QUALITY = "image_cache", 30, 200 * 1024 * 1024, 90
+RENDER_THREADS_PER_JOB, RENDER_SEED = 2, None; RENDER_MODE = "clips"  # "clips": one encode per clip + concat; "graph": one ffmpeg filter graph for the whole video
+CLIP_IO_WORKERS, CLIP_CPU_WORKERS, CLIP_INPROCESS_MAX = 8, max(1, min(4, os.cpu_count() or 1)), 2
+LLM_MODEL, LLM_CACHE_FILE, LLM_MAX_WORKERS, LLM_REQUESTS_PER_MINUTE = "llama3-8b-8192", "llm_cache.json", 4, 30; LLM_CALL_STATS, LLM_STATS_LOCK = [], threading.Lock()
+NEAR_DUPLICATE_THRESHOLD, NEAR_DUPLICATE_MAX_STORIES = 0.4, 5000; MINHASH_NUM_PERM, LSH_BANDS, MINHASH_PRIME = 96, 32, (1 << 61) - 1
+MINHASH_PERMUTATIONS = [(rng.randrange(1, MINHASH_PRIME), rng.randrange(0, MINHASH_PRIME)) for rng in [random.Random(1729)] for _ in range(MINHASH_NUM_PERM)]
+NLP_STAGE_PIPES = {"sentences": ["senter"], "headline": ["tok2vec", "tagger", "attribute_ruler", "ner"]}; NLP_DOC_CACHE = {}
 SEGMENT_SOURCES = {"Top Stories": [{"name": "The Leading Report", "url": "https://theleadingreport.com/", "type": "custom"}, {"name": "Associated Press", "url": "https://storage.googleapis.com/afs-prod/feeds/topnews.xml"}, {"name": "Reuters Top News", "url": "http://feeds.reuters.com/reuters/topNews"}, {"name": "NPR News", "url": "https://feeds.npr.org/1001/rss.xml"},], "Political": [{"name": "The Leading Report", "url": "https://theleadingreport.com/", "type": "custom"}, {"name": "Reuters Politics", "url": "http://feeds.reuters.com/reuters/politicsNews"}, {"name": "Politico", "url": "https://rss.politico.com/politico.xml"}, {"name": "The Hill", "url": "https://thehill.com/rss/syndicator/19109"},], "US National": [{"name": "Reuters US News", "url": "http://feeds.reuters.com/reuters/domesticNews"}, {"name": "NPR National News", "url": "https://feeds.npr.org/1003/rss.xml"},]}
 SEGMENT_ORDER = ["Top Stories", "Political", "US National"]
+RSS_FEED_TIMEOUT, RSS_RUN_DEADLINE, RSS_MAX_WORKERS = 15, 40, 8; FEED_CACHE_FILE = "feed_cache.json"; LEADING_REPORT_CONCURRENCY, LEADING_REPORT_SELECTOR_TIMEOUT = 4, 15000; BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+FEED_CACHE_STATS = {"requests": 0, "not_modified": 0, "bytes_saved": 0, "parse_seconds_saved": 0.0}
 KEN_BURNS_EFFECTS = [ "zoompan=z='min(zoom+0.001,1.1)':d=1:x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)'", "zoompan=z='min(zoom+0.0012,1.15)':d=1:x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)'", "zoompan=z=1.1:x='if(gte(in_w,iw),0,if(eq(mod(on,2),0),min(x+1,iw-in_w),x))':y='if(gte(in_h,ih),0,if(eq(mod(on,3),0),min(y+1,ih-in_h),y))'", "zoompan=z=1.1:x='min(x+iw/200, iw-iw/1.1)':y=0", "zoompan=z=1.1:x=0:y='min(y+ih/200, ih-ih/1.1)'", "zoompan=z=1.1:x='min(x+iw/250, iw-iw/1.1)':y='min(y+ih/250, ih-ih/1.1)'", "zoompan=z='min(zoom+0.001,1.15)':d=1:x='min(x+iw/300, iw-iw/zoom)':y='min(y+ih/400, ih-ih/zoom)'"]
+# The same trajectories for the "frames" engine, in units of the source width/height: zoom(prev_zoom), x(prev_x, zoom), y(prev_y, zoom).
+# zoompan keeps zoom/x/y between output frames, clamps zoom to [1, 10] and x, y to [0, 1 - 1/zoom]; in_w is iw, so entry 2 never pans.
+KEN_BURNS_MOTIONS = [
+    (lambda z: min(z + 0.001, 1.1), lambda x, z: 0.5 - 0.5 / z, lambda y, z: 0.5 - 0.5 / z),
+    (lambda z: min(z + 0.0012, 1.15), lambda x, z: 0.5 - 0.5 / z, lambda y, z: 0.5 - 0.5 / z),
+    (lambda z: 1.1, lambda x, z: 0.0, lambda y, z: 0.0),
+    (lambda z: 1.1, lambda x, z: min(x + 1 / 200, 1 - 1 / 1.1), lambda y, z: 0.0),
+    (lambda z: 1.1, lambda x, z: 0.0, lambda y, z: min(y + 1 / 200, 1 - 1 / 1.1)),
+    (lambda z: 1.1, lambda x, z: min(x + 1 / 250, 1 - 1 / 1.1), lambda y, z: min(y + 1 / 250, 1 - 1 / 1.1)),
+    (lambda z: min(z + 0.001, 1.15), lambda x, z: min(x + 1 / 300, 1 - 1 / z), lambda y, z: min(y + 1 / 400, 1 - 1 / z)),
+]
+# "zoompan" renders with KEN_BURNS_EFFECTS as before; "frames" crops one decoded still per frame and pipes raw RGB to ffmpeg
+KEN_BURNS_ENGINE, KEN_BURNS_PRESET = "zoompan", "quality"; KEN_BURNS_PRESETS = {"quality": ("bicubic", "medium"), "speed": ("bilinear", "veryfast"), "draft": ("nearest", "ultrafast")}  # (PIL resample, x264 preset)
 
 # --- THIS FUNCTION IS CORRECTED ---
-async def generate_dynamic_audio_async(text, output_path):
-    rate_val = random.randint(-10, 15)
-    rate_str = f"+{rate_val}%" if rate_val >= 0 else f"{rate_val}%"
-    pitch_val = random.randint(-10, 10)
-    pitch_str = f"+{pitch_val}Hz" if pitch_val >= 0 else f"{pitch_val}Hz"
-    logger.info(f"Generating audio with dynamic voice: Rate={rate_str}, Pitch={pitch_str}")
-    communicate = edge_tts.Communicate(text, VOICE, rate=rate_str, pitch=pitch_str)
-    await communicate.save(output_path)
+class TTSService:
+    # One long-lived event loop on a background thread: utterances submitted from any thread share it instead of paying for
+    # asyncio.run per clip, run concurrently under a semaphore, retry dropped connections, and capture WordBoundary timings
+    def __init__(self, max_concurrency=TTS_MAX_CONCURRENCY, seed=None, max_retries=TTS_MAX_RETRIES):
+        self.seed, self.max_retries, self.semaphore = seed, max_retries, asyncio.Semaphore(max_concurrency)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="tts-loop", daemon=True); self.thread.start()
+    def voice_params(self, text):
+        # With a seed, rate/pitch depend only on (seed, text), so reruns and cached outputs are reproducible regardless of scheduling
+        rng = random.Random(f"{self.seed}:{text}") if self.seed is not None else random
+        rate_val = rng.randint(-10, 15)
+        rate_str = f"+{rate_val}%" if rate_val >= 0 else f"{rate_val}%"
+        pitch_val = rng.randint(-10, 10)
+        pitch_str = f"+{pitch_val}Hz" if pitch_val >= 0 else f"{pitch_val}Hz"
+        return rate_str, pitch_str
+    async def synthesize_async(self, text, output_path):
+        import aiohttp, edge_tts
+        retryable = (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError, edge_tts.exceptions.NoAudioReceived, edge_tts.exceptions.WebSocketError)
+        rate_str, pitch_str = self.voice_params(text)
+        async with self.semaphore:
+            logger.info(f"Generating audio with dynamic voice: Rate={rate_str}, Pitch={pitch_str}")
+            for attempt in range(1, self.max_retries + 1):
+                audio, words = bytearray(), []
+                try:
+                    communicate = edge_tts.Communicate(text, VOICE, rate=rate_str, pitch=pitch_str, boundary="WordBoundary")
+                    async for chunk in communicate.stream():
+                        if chunk["type"] == "audio": audio.extend(chunk["data"])
+                        # Offsets and durations arrive in 100 ns ticks
+                        elif chunk["type"] == "WordBoundary": words.append({"text": chunk["text"], "offset": chunk["offset"] / 1e7, "duration": chunk["duration"] / 1e7})
+                    break
+                except retryable as e:
+                    if attempt == self.max_retries: raise
+                    logger.warning(f"TTS connection dropped ({e}), retrying ({attempt}/{self.max_retries})..."); await asyncio.sleep(2 ** (attempt - 1))
+        with open(output_path, 'wb') as f: f.write(audio)
+        return {"path": output_path, "words": words, "rate": rate_str, "pitch": pitch_str}
+    def submit(self, text, output_path): return asyncio.run_coroutine_threadsafe(self.synthesize_async(text, output_path), self.loop)
+    def close(self): self.loop.call_soon_threadsafe(self.loop.stop); self.thread.join(); self.loop.close()
+def get_tts_service():
+    global TTS_SERVICE
+    with TTS_SERVICE_LOCK:
+        if TTS_SERVICE is None: TTS_SERVICE = TTSService(seed=TTS_SEED)
+    return TTS_SERVICE
 
 def generate_audio(text, output_path):
     try:
-        asyncio.run(generate_dynamic_audio_async(text, output_path))
-        return True
+        return get_tts_service().submit(text, output_path).result()
     except Exception as e:
         logger.error(f"Error generating audio: {e}")
-        return False
+        return None
 
 # --- NEW: LLM Integration ---
 def setup_config():
-    global UNSPLASH_API_KEY, GROQ_API_KEY
+    global UNSPLASH_API_KEY, GROQ_API_KEY, TTS_SEED, RENDER_SEED, RENDER_MODE, KEN_BURNS_ENGINE, KEN_BURNS_PRESET
     if not os.path.exists(CONFIG_FILE): logger.error(f"FATAL: Config file '{CONFIG_FILE}' not found."); return False
     config = configparser.ConfigParser(); config.read(CONFIG_FILE)
     UNSPLASH_API_KEY = config.get('API_KEYS', 'UNSPLASH_ACCESS_KEY', fallback=None)
     GROQ_API_KEY = config.get('API_KEYS', 'GROQ_API_KEY', fallback=None)
+    TTS_SEED = config.get('TTS', 'SEED', fallback=None)
+    RENDER_SEED = config.get('VIDEO', 'SEED', fallback=None)
+    RENDER_MODE = config.get('VIDEO', 'RENDER_MODE', fallback=RENDER_MODE)
+    KEN_BURNS_ENGINE = config.get('VIDEO', 'KEN_BURNS_ENGINE', fallback=KEN_BURNS_ENGINE)
+    KEN_BURNS_PRESET = config.get('VIDEO', 'KEN_BURNS_PRESET', fallback=KEN_BURNS_PRESET)
+    if RENDER_MODE not in ("clips", "graph") or KEN_BURNS_ENGINE not in ("zoompan", "frames") or KEN_BURNS_PRESET not in KEN_BURNS_PRESETS: logger.error(f"FATAL: Unknown render mode/Ken Burns engine/preset '{RENDER_MODE}'/'{KEN_BURNS_ENGINE}'/'{KEN_BURNS_PRESET}' in '{CONFIG_FILE}'."); return False
     if not UNSPLASH_API_KEY or not GROQ_API_KEY: logger.error(f"FATAL: Unsplash or Groq API key not found in '{CONFIG_FILE}'."); return False
     return True
 
-def get_llm_script(title, summary, client):
-    logger.info("Requesting LLM to rewrite summary into a professional news script...")
+class RateLimiter:
+    # Spaces calls evenly so concurrent workers never exceed requests_per_minute
+    def __init__(self, requests_per_minute): self.interval = 60.0 / requests_per_minute; self.next_slot = 0.0; self.lock = threading.Lock()
+    def wait(self):
+        with self.lock: now = time.monotonic(); slot = max(now, self.next_slot); self.next_slot = slot + self.interval
+        time.sleep(max(0.0, slot - now))
+def load_llm_cache():
+    if not os.path.exists(LLM_CACHE_FILE): return {}
+    try:
+        with open(LLM_CACHE_FILE, 'r', encoding='utf-8') as f: return json.load(f)
+    except (OSError, ValueError) as e: logger.warning(f"Ignoring unreadable LLM cache '{LLM_CACHE_FILE}': {e}"); return {}
+def save_llm_cache(llm_cache):
+    tmp_path = f"{LLM_CACHE_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f: json.dump(llm_cache, f)
+    os.replace(tmp_path, LLM_CACHE_FILE)
+def llm_cache_key(model, messages): return hashlib.sha256(json.dumps({"model": model, "messages": messages}, sort_keys=True).encode('utf-8')).hexdigest()
+def get_llm_script(title, summary, client, llm_cache=None, rate_limiter=None):
     prompt_messages = [
         {"role": "system", "content": "You are a professional news scriptwriter for a short-form vertical video. Your task is to distill a news article's headline and summary into a concise, authoritative, broadcast-style script. Rules: 1. Speak directly and factually. 2. DO NOT use any conversational filler (e.g., 'Hey there,' 'As you know,'). 3. DO NOT address the audience directly. 4. Combine the headline and summary into a seamless narrative. 5. Your entire response should ONLY be the script text itself. No extra commentary or labels."},
         {"role": "user", "content": f"Headline: \"{title}\". Summary: \"{summary}\""}
     ]
+    cache_key = llm_cache_key(LLM_MODEL, prompt_messages)
+    if llm_cache is not None and cache_key in llm_cache:
+        logger.info("LLM script served from cache.")
+        with LLM_STATS_LOCK: LLM_CALL_STATS.append({"title": title, "cached": True, "latency": 0.0, "prompt_tokens": 0, "completion_tokens": 0})
+        return llm_cache[cache_key]
+    logger.info("Requesting LLM to rewrite summary into a professional news script...")
+    if rate_limiter: rate_limiter.wait()
+    start = time.perf_counter()
     try:
-        chat_completion = client.chat.completions.create(messages=prompt_messages, model="llama3-8b-8192")
+        chat_completion = client.chat.completions.create(messages=prompt_messages, model=LLM_MODEL)
         llm_script = chat_completion.choices[0].message.content.strip().replace("Here's the rewritten script:", "").strip()
-        logger.info("LLM rewrite successful.")
+        usage = getattr(chat_completion, 'usage', None)
+        with LLM_STATS_LOCK:
+            LLM_CALL_STATS.append({"title": title, "cached": False, "latency": time.perf_counter() - start, "prompt_tokens": getattr(usage, 'prompt_tokens', 0) or 0, "completion_tokens": getattr(usage, 'completion_tokens', 0) or 0})
+            if llm_cache is not None: llm_cache[cache_key] = llm_script
+        logger.info(f"LLM rewrite successful ({time.perf_counter() - start:.2f}s).")
         return llm_script
     except Exception as e: logger.error(f"LLM request failed: {e}"); return f"{title}. {summary}"
+def get_llm_scripts(news_items, client, max_workers=LLM_MAX_WORKERS, on_script=None):
+    # Rewrites every selected headline in parallel under the rate limit; identical prompts from earlier runs come from the cache for free.
+    # on_script(index, script) is called from the worker as soon as that headline's script is ready, without waiting for the others.
+    llm_cache = load_llm_cache(); rate_limiter = RateLimiter(LLM_REQUESTS_PER_MINUTE); first_stat = len(LLM_CALL_STATS)
+    def rewrite(index, item):
+        script = get_llm_script(item['title'], item['summary'], client, llm_cache, rate_limiter)
+        if on_script: on_script(index, script)
+        return script
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(news_items)))) as executor:
+        scripts = list(executor.map(rewrite, range(len(news_items)), news_items))
+    try: save_llm_cache(llm_cache)
+    except OSError as e: logger.warning(f"Could not save LLM cache: {e}")
+    run_stats = LLM_CALL_STATS[first_stat:]
+    logger.info(f"LLM: {sum(1 for stat in run_stats if stat['cached'])}/{len(run_stats)} cached, {sum(stat['prompt_tokens'] for stat in run_stats)} prompt + {sum(stat['completion_tokens'] for stat in run_stats)} completion tokens, {sum(stat['latency'] for stat in run_stats):.2f}s total latency.")
+    return scripts
 
 def get_next_segment():
     last_segment = "";
@@ -77,28 +184,194 @@ def get_next_segment():
     return current_segment_name, SEGMENT_SOURCES[current_segment_name]
 def setup_nlp_model():
     global NLP_MODEL
-    try: NLP_MODEL = spacy.load("en_core_web_sm"); return True
+    import spacy
+    try: NLP_MODEL = spacy.load("en_core_web_sm", exclude=["lemmatizer"])
     except OSError: logger.error("FATAL: spaCy model 'en_core_web_sm' not found."); return False
+    # The statistical sentence segmenter ships disabled; it is all the "sentences" stage needs
+    if "senter" in NLP_MODEL.disabled: NLP_MODEL.enable_pipe("senter")
+    return True
+def nlp_docs(texts, stage):
+    # Each text is parsed at most once per stage; everything not yet cached goes through a single nlp.pipe batch with only that stage's components
+    missing = list(dict.fromkeys(text for text in texts if (stage, text) not in NLP_DOC_CACHE))
+    if missing and NLP_MODEL is None and not setup_nlp_model(): raise RuntimeError("spaCy model 'en_core_web_sm' is not available.")
+    if missing:
+        enabled = [name for name in NLP_STAGE_PIPES[stage] if name in NLP_MODEL.pipe_names] or NLP_MODEL.pipe_names
+        with NLP_MODEL.select_pipes(enable=enabled):
+            for text, doc in zip(missing, NLP_MODEL.pipe(missing, batch_size=64)): NLP_DOC_CACHE[(stage, text)] = doc
+    return [NLP_DOC_CACHE[(stage, text)] for text in texts]
+class ProcessedUrlHistory:
+    # SQLite-backed set of processed URLs keyed by URL hash: membership is an indexed lookup, nothing is loaded up front,
+    # and writes are single IMMEDIATE transactions so overlapping runs never interleave or lose entries. The custom scrape checks
+    # membership from an executor thread, hence the lock.
+    def __init__(self, db_path=HISTORY_DB_FILE):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS processed_urls (url_hash BLOB PRIMARY KEY, url TEXT NOT NULL, processed_at REAL NOT NULL) WITHOUT ROWID")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS processed_urls_processed_at ON processed_urls (processed_at)")
+    @staticmethod
+    def url_hash(url): return hashlib.sha1(url.encode('utf-8')).digest()
+    def __contains__(self, url):
+        with self.lock: return self.conn.execute("SELECT 1 FROM processed_urls WHERE url_hash = ?", (self.url_hash(url),)).fetchone() is not None
+    def add(self, urls, processed_at=None):
+        processed_at = processed_at or time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany("INSERT OR IGNORE INTO processed_urls (url_hash, url, processed_at) VALUES (?, ?, ?)", [(self.url_hash(url), url, processed_at) for url in urls])
+                self.conn.execute("COMMIT")
+            except BaseException: self.conn.execute("ROLLBACK"); raise
+    def prune(self, ttl_seconds):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try: deleted = self.conn.execute("DELETE FROM processed_urls WHERE processed_at < ?", (time.time() - ttl_seconds,)).rowcount; self.conn.execute("COMMIT")
+            except BaseException: self.conn.execute("ROLLBACK"); raise
+        return deleted
+    def migrate_text_file(self, path):
+        # One-time import of the old processed_urls.txt; entries are dated with the file's mtime so the TTL still applies
+        with open(path, 'r') as f: urls = [line.strip() for line in f if line.strip()]
+        self.add(urls, processed_at=os.path.getmtime(path))
+        try: os.replace(path, path + ".migrated")
+        except FileNotFoundError: pass  # Another run migrated it first
+        logger.info(f"Migrated {len(urls)} URLs from '{path}' into '{HISTORY_DB_FILE}'.")
+    def close(self): self.conn.close()
+def story_shingles(text):
+    # Word set of the story (short words dropped): same-story rewrites across outlets share most of their content words
+    return {word for word in re.findall(r"[a-z0-9']+", text.lower()) if len(word) > 2}
+def minhash_signature(text):
+    hashes = [int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little') for shingle in story_shingles(text)]
+    if not hashes: return None
+    return [min((a * h + b) % MINHASH_PRIME for h in hashes) for a, b in MINHASH_PERMUTATIONS]
+def minhash_similarity(signature_a, signature_b): return sum(1 for x, y in zip(signature_a, signature_b) if x == y) / MINHASH_NUM_PERM
+def lsh_buckets(signature):
+    rows = MINHASH_NUM_PERM // LSH_BANDS
+    return [(band, int.from_bytes(hashlib.blake2b(struct.pack(f"{rows}Q", *signature[band * rows:(band + 1) * rows]), digest_size=8).digest(), 'little', signed=True)) for band in range(LSH_BANDS)]
+class ImageCache:
+    # Persistent Unsplash cache: query -> image URL, and image URL -> JPEG already cropped to the clip's image area, so recurring
+    # queries (politicians, agencies) skip both the API call and the download. Entries expire after ttl_seconds and image files
+    # are evicted least recently used beyond max_bytes. Shared by the download threads, hence the lock.
+    def __init__(self, cache_dir=IMAGE_CACHE_DIR, ttl_seconds=IMAGE_CACHE_TTL_DAYS * 86400, max_bytes=IMAGE_CACHE_MAX_BYTES):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir, self.ttl_seconds, self.max_bytes, self.lock = cache_dir, ttl_seconds, max_bytes, threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(cache_dir, "index.db"), timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS image_queries (query TEXT PRIMARY KEY, url TEXT NOT NULL, fetched_at REAL NOT NULL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS image_files (url TEXT PRIMARY KEY, file_name TEXT NOT NULL, size INTEGER NOT NULL, fetched_at REAL NOT NULL, used_at REAL NOT NULL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS image_files_used_at ON image_files (used_at)")
+        self.prune()
+    def get_url(self, query):
+        with self.lock: row = self.conn.execute("SELECT url FROM image_queries WHERE query = ? AND fetched_at >= ?", (query, time.time() - self.ttl_seconds)).fetchone()
+        return row[0] if row else None
+    def put_url(self, query, url):
+        with self.lock: self.conn.execute("INSERT OR REPLACE INTO image_queries (query, url, fetched_at) VALUES (?, ?, ?)", (query, url, time.time()))
+    def get_image(self, url):
+        with self.lock:
+            row = self.conn.execute("SELECT file_name FROM image_files WHERE url = ? AND fetched_at >= ?", (url, time.time() - self.ttl_seconds)).fetchone()
+            if not row: return None
+            try:
+                with open(os.path.join(self.cache_dir, row[0]), 'rb') as f: data = f.read()
+            except OSError: self.conn.execute("DELETE FROM image_files WHERE url = ?", (url,)); return None
+            self.conn.execute("UPDATE image_files SET used_at = ? WHERE url = ?", (time.time(), url))
+            return data
+    def put_image(self, url, jpeg_bytes):
+        file_name = hashlib.sha1(url.encode('utf-8')).hexdigest() + ".jpg"; path = os.path.join(self.cache_dir, file_name)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"  # Unique across threads and overlapping runs
+        with open(tmp_path, 'wb') as f: f.write(jpeg_bytes)
+        os.replace(tmp_path, path)
+        now = time.time()
+        with self.lock: self.conn.execute("INSERT OR REPLACE INTO image_files (url, file_name, size, fetched_at, used_at) VALUES (?, ?, ?, ?, ?)", (url, file_name, len(jpeg_bytes), now, now))
+        self.prune()
+    def prune(self):
+        # Expired entries go first, so the size limit is enforced over (and only evicts) the entries still live
+        with self.lock:
+            cutoff = time.time() - self.ttl_seconds
+            self.conn.execute("DELETE FROM image_queries WHERE fetched_at < ?", (cutoff,))
+            stale = self.conn.execute("SELECT url, file_name FROM image_files WHERE fetched_at < ?", (cutoff,)).fetchall()
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM image_files WHERE fetched_at >= ?", (cutoff,)).fetchone()[0]
+            if total > self.max_bytes:
+                for url, file_name, size in self.conn.execute("SELECT url, file_name, size FROM image_files WHERE fetched_at >= ? ORDER BY used_at", (cutoff,)).fetchall():
+                    if total <= self.max_bytes: break
+                    stale.append((url, file_name)); total -= size
+            for url, file_name in stale:
+                self.conn.execute("DELETE FROM image_files WHERE url = ?", (url,))
+                try: os.remove(os.path.join(self.cache_dir, file_name))
+                except FileNotFoundError: pass
+    def close(self): self.conn.close()
+class NearDuplicateIndex:
+    # MinHash/LSH index of already-published stories, stored next to the URL history so memory use stays flat;
+    # a lookup only reads the signatures that share an LSH bucket with the candidate
+    def __init__(self, db_path=HISTORY_DB_FILE, threshold=NEAR_DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS story_signatures (story_id INTEGER PRIMARY KEY, url TEXT NOT NULL, signature BLOB NOT NULL, added_at REAL NOT NULL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS story_buckets (band INTEGER NOT NULL, bucket INTEGER NOT NULL, story_id INTEGER NOT NULL REFERENCES story_signatures ON DELETE CASCADE, PRIMARY KEY (band, bucket, story_id)) WITHOUT ROWID")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS story_signatures_added_at ON story_signatures (added_at)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS story_buckets_story_id ON story_buckets (story_id)")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+    def find_near_duplicate(self, signature):
+        if signature is None: return None
+        candidate_ids = set()
+        for band, bucket in lsh_buckets(signature):
+            candidate_ids.update(row[0] for row in self.conn.execute("SELECT story_id FROM story_buckets WHERE band = ? AND bucket = ?", (band, bucket)))
+        for story_id in candidate_ids:
+            url, blob = self.conn.execute("SELECT url, signature FROM story_signatures WHERE story_id = ?", (story_id,)).fetchone()
+            if minhash_similarity(signature, struct.unpack(f"{MINHASH_NUM_PERM}Q", blob)) >= self.threshold: return url
+        return None
+    def add(self, items):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for item in items:
+                signature = minhash_signature(f"{item['title']} {item['summary']}")
+                if signature is None: continue
+                story_id = self.conn.execute("INSERT INTO story_signatures (url, signature, added_at) VALUES (?, ?, ?)", (item['link'], struct.pack(f"{MINHASH_NUM_PERM}Q", *signature), time.time())).lastrowid
+                self.conn.executemany("INSERT OR IGNORE INTO story_buckets (band, bucket, story_id) VALUES (?, ?, ?)", [(band, bucket, story_id) for band, bucket in lsh_buckets(signature)])
+            self.conn.execute("COMMIT")
+        except BaseException: self.conn.execute("ROLLBACK"); raise
+    def prune(self, ttl_seconds, max_stories=NEAR_DUPLICATE_MAX_STORIES):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute("DELETE FROM story_signatures WHERE added_at < ?", (time.time() - ttl_seconds,))
+            self.conn.execute("DELETE FROM story_signatures WHERE story_id NOT IN (SELECT story_id FROM story_signatures ORDER BY added_at DESC LIMIT ?)", (max_stories,))
+            self.conn.execute("COMMIT")
+        except BaseException: self.conn.execute("ROLLBACK"); raise
+    def close(self): self.conn.close()
 def load_processed_urls():
-    if not os.path.exists(HISTORY_FILE): return set()
-    with open(HISTORY_FILE, 'r') as f: return {line.strip() for line in f if line.strip()}
-def save_processed_urls(new_urls):
-    with open(HISTORY_FILE, 'a') as f:
-        for url in new_urls: f.write(url + '\n')
+    history = ProcessedUrlHistory()
+    if os.path.exists(HISTORY_FILE): history.migrate_text_file(HISTORY_FILE)
+    pruned = history.prune(HISTORY_TTL_DAYS * 86400)
+    if pruned: logger.info(f"Pruned {pruned} URLs older than {HISTORY_TTL_DAYS} days from history.")
+    return history
+def save_processed_urls(history, new_urls):
+    history.add(new_urls)
     logger.info(f"Saved {len(new_urls)} new URLs to history.")
 def setup_font():
     global FONT_PATH
+    # font_manager builds (or loads) matplotlib's font list on import, so remember the answer between runs
+    if os.path.exists(FONT_CACHE_FILE):
+        with open(FONT_CACHE_FILE, 'r') as f: cached_path = f.read().strip()
+        if cached_path and os.path.exists(cached_path): FONT_PATH = cached_path; return True
+    from matplotlib import font_manager
     font_preferences = ["Arial", "Helvetica Neue", "Calibri", "Helvetica", "DejaVu Sans"]
     for font_name in font_preferences:
-        try: FONT_PATH = font_manager.findfont(font_name, fallback_to_default=False); return True
-        except Exception: pass
+        # str(): newer matplotlib returns a FontPath str subclass, which can't be pickled to the compose workers
+        try: FONT_PATH = str(font_manager.findfont(font_name, fallback_to_default=False))
+        except Exception: continue
+        try:
+            with open(FONT_CACHE_FILE, 'w') as f: f.write(FONT_PATH)
+        except OSError as e: logger.warning(f"Could not cache font path: {e}")
+        return True
     logger.error("FATAL: Could not find any suitable system fonts."); return False
 def setup_output_directory(): return tempfile.mkdtemp(prefix="news_video_")
-def clean_summary_text(raw_text):
+def strip_summary_markup(raw_text):
     text = html.unescape(raw_text); text = re.sub('<[^<]+?>', '', text)
     junk_patterns = [r'\[\s*\+\s*video\s*\]', r'(?i)\b(continue reading|read more)\b.*', r'<img.*?>']
     for pattern in junk_patterns: text = re.sub(pattern, '', text, flags=re.IGNORECASE)
-    doc = NLP_MODEL(text); sentences = [sent.text.strip() for sent in doc.sents]
+    return text
+def clean_summary_texts(raw_texts):
+    docs = nlp_docs([strip_summary_markup(raw_text) for raw_text in raw_texts], "sentences")
+    return [summarize_sentences([sent.text.strip() for sent in doc.sents]) for doc in docs]
+def summarize_sentences(sentences):
     clean_summary = ""
     sentence_count = 0
     for sent in sentences:
@@ -107,160 +380,463 @@ def clean_summary_text(raw_text):
             if sentence_count >= 2 and len(clean_summary) > 180: break
             if sentence_count >= 3: break
     return clean_summary.strip()
-def scrape_leading_report(processed_urls, limit):
-    logger.info("-> Firing up custom scraper for The Leading Report...")
-    articles = []; base_url = "https://theleadingreport.com/"
-    try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page(user_agent=USER_AGENT)
-            page.goto(base_url, wait_until="networkidle", timeout=60000)
-            link_elements = page.locator("article h3.entry-title a").all()
-            for link_element in link_elements[:limit]:
-                href = link_element.get_attribute("href"); title = link_element.inner_text().strip()
+async def block_heavy_resources(route):
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES: await route.abort()
+    else: await route.continue_()
+async def scrape_leading_report_async(processed_urls, limit):
+    base_url = "https://theleadingreport.com/"
+    from playwright.async_api import async_playwright
+    async with async_playwright() as p:
+        # One browser and one context for the index and every article page; images, fonts and media are never downloaded
+        browser = await p.chromium.launch(headless=True)
+        try:
+            context = await browser.new_context(user_agent=USER_AGENT); await context.route("**/*", block_heavy_resources)
+            page = await context.new_page()
+            # Wait for the headline links themselves rather than network idle, in case they are injected after DOMContentLoaded
+            await page.goto(base_url, wait_until="domcontentloaded", timeout=60000)
+            try: await page.wait_for_selector("article h3.entry-title a", timeout=LEADING_REPORT_SELECTOR_TIMEOUT)
+            except Exception as e: logger.warning(f"No headline links appeared on {base_url}: {e}")
+            candidates = []
+            for link_element in (await page.locator("article h3.entry-title a").all())[:limit]:
+                href = await link_element.get_attribute("href"); title = (await link_element.inner_text()).strip()
                 full_url = urljoin(base_url, href)
-                if full_url and title and full_url not in processed_urls:
-                    article_page = browser.new_page(user_agent=USER_AGENT)
+                if full_url and title and full_url not in processed_urls: candidates.append((title, full_url))
+            await page.close()
+            semaphore = asyncio.Semaphore(LEADING_REPORT_CONCURRENCY)
+            async def fetch_article(title, full_url):
+                async with semaphore:
+                    article_page = await context.new_page()
                     try:
-                        article_page.goto(full_url, wait_until="domcontentloaded", timeout=45000)
-                        p_tags = article_page.locator("div.entry-content p").all()[:3]
-                        raw_summary = " ".join([p.inner_text() for p in p_tags])
-                        summary = clean_summary_text(raw_summary)
-                        if summary:
-                            articles.append({"title": title, "link": full_url, "summary": summary})
-                            logger.info(f"  -> Scraped: {title[:50]}...")
-                    except Exception as e: logger.error(f"     Failed to process article page {full_url}: {e}")
-                    finally: article_page.close()
-            browser.close()
-    except Exception as e: logger.error(f"An error occurred during custom scraping for The Leading Report: {e}")
-    return articles
-def scrape_news(segment_feeds, processed_urls):
-    all_headlines = []; headers = {"User-Agent": USER_AGENT}
-    for source in segment_feeds:
-        if source.get("type") == "custom":
-            all_headlines.extend(scrape_leading_report(processed_urls, 10))
-            continue
-        try:
-            logger.info(f"Scraping {source['name']} (RSS)")
-            response = requests.get(source['url'], headers=headers, timeout=15); response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'lxml-xml')
-            for item in soup.find_all('item', limit=10):
-                link = item.find('link').text.strip() if item.find('link') else None
-                if link and link not in processed_urls:
-                    title = item.find('title').text.strip()
-                    desc_tag = item.find('description')
-                    if title and desc_tag and desc_tag.text:
-                        summary = clean_summary_text(desc_tag.text)
-                        if 50 < len(summary) < 600:
-                            all_headlines.append({ "title": title, "link": link, "summary": summary })
-        except Exception as e: logger.error(f"Failed to scrape RSS feed {source['name']}: {e}")
+                        await article_page.goto(full_url, wait_until="domcontentloaded", timeout=45000)
+                        p_tags = (await article_page.locator("div.entry-content p").all())[:3]
+                        return title, full_url, " ".join([await p.inner_text() for p in p_tags])
+                    except Exception as e: logger.error(f"     Failed to process article page {full_url}: {e}"); return None
+                    finally: await article_page.close()
+            return [result for result in await asyncio.gather(*(fetch_article(title, full_url) for title, full_url in candidates)) if result]
+        finally: await browser.close()
+def scrape_leading_report(processed_urls, limit, timeout=None):
+    # Returns raw summaries; scrape_news cleans them together with the RSS items in one spaCy batch.
+    # timeout bounds the whole scrape; cancelling it closes the browser on the way out.
+    logger.info("-> Firing up custom scraper for The Leading Report...")
+    try: return [{"title": title, "link": full_url, "raw_summary": raw_summary} for title, full_url, raw_summary in asyncio.run(asyncio.wait_for(scrape_leading_report_async(processed_urls, limit), timeout))]
+    except asyncio.TimeoutError: logger.error("Stopped The Leading Report scrape: run deadline exceeded."); return []
+    except Exception as e: logger.error(f"An error occurred during custom scraping for The Leading Report: {e}"); return []
+def create_http_session(pool_size=RSS_MAX_WORKERS):
+    session = requests.Session(); session.headers.update({"User-Agent": USER_AGENT})
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter); session.mount("https://", adapter)
+    return session
+def load_feed_cache():
+    if not os.path.exists(FEED_CACHE_FILE): return {}
+    try:
+        with open(FEED_CACHE_FILE, 'r', encoding='utf-8') as f: return json.load(f)
+    except (OSError, ValueError) as e: logger.warning(f"Ignoring unreadable feed cache '{FEED_CACHE_FILE}': {e}"); return {}
+def save_feed_cache(feed_cache):
+    tmp_path = f"{FEED_CACHE_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f: json.dump(feed_cache, f)
+    os.replace(tmp_path, FEED_CACHE_FILE)
+def fetch_feed(session, source, cached=None, timeout=RSS_FEED_TIMEOUT):
+    logger.info(f"Scraping {source['name']} (RSS)")
+    headers = {}
+    if cached and cached.get('etag'): headers['If-None-Match'] = cached['etag']
+    if cached and cached.get('last_modified'): headers['If-Modified-Since'] = cached['last_modified']
+    response = session.get(source['url'], headers=headers, timeout=timeout); response.raise_for_status()
+    return response
+def parse_rss_items(content):
+    # Returns every item with a raw summary regardless of history, so the raw items can be cached and filtered on later runs,
+    # and the parse time, which leaves out the one-off bs4 import since it is reported as saved on every later 304
+    from bs4 import BeautifulSoup
+    parse_start = time.perf_counter(); raw_items = []
+    soup = BeautifulSoup(content, 'lxml-xml')
+    for item in soup.find_all('item', limit=10):
+        link = item.find('link').text.strip() if item.find('link') else None
+        if link:
+            title = item.find('title').text.strip()
+            desc_tag = item.find('description')
+            if title and desc_tag and desc_tag.text:
+                raw_items.append({ "title": title, "link": link, "raw_summary": desc_tag.text })
+    return raw_items, time.perf_counter() - parse_start
+def select_headlines(headlines, story_index=None, limit=None):
+    # Takes headlines in (shuffled) order, skipping any that is a near-duplicate of a published story or of one already picked this run
+    selected, selected_signatures, limit = [], [], HEADLINES_LIMIT if limit is None else limit
+    threshold = story_index.threshold if story_index else NEAR_DUPLICATE_THRESHOLD
+    for item in headlines:
+        if len(selected) >= limit: break
+        signature = minhash_signature(f"{item['title']} {item['summary']}")
+        if signature is not None and any(minhash_similarity(signature, other) >= threshold for other in selected_signatures):
+            logger.info(f"Skipping near-duplicate of a story in this run: {item['title'][:60]}"); continue
+        duplicate_of = story_index.find_near_duplicate(signature) if story_index else None
+        if duplicate_of: logger.info(f"Skipping near-duplicate of {duplicate_of}: {item['title'][:60]}"); continue
+        selected.append(item)
+        if signature is not None: selected_signatures.append(signature)
+    return selected
+def scrape_news(segment_feeds, processed_urls, session=None, deadline=RSS_RUN_DEADLINE, story_index=None):
+    # RSS feeds are downloaded concurrently over one pooled session (and the custom scrape alongside them), all under one run deadline; parsing stays on this thread, in feed order, so the result matches a sequential run
+    own_session = session is None; session = session or create_http_session()
+    run_deadline = time.monotonic() + deadline; rss_sources = [source for source in segment_feeds if source.get("type") != "custom"]; custom_sources = [source for source in segment_feeds if source.get("type") == "custom"]
+    executor = ThreadPoolExecutor(max_workers=max(1, min(RSS_MAX_WORKERS, len(rss_sources)) + len(custom_sources)))
+    feed_cache = load_feed_cache()
+    # Entries written before raw items were cached can't be reused, so they don't get conditional requests either
+    feed_cache = {url: entry for url, entry in feed_cache.items() if 'raw_items' in entry}
+    futures = {source['url']: executor.submit(fetch_feed, session, source, feed_cache.get(source['url'])) for source in rss_sources}
+    # The Playwright scrape runs alongside the feeds under the same run deadline
+    futures.update({source['url']: executor.submit(scrape_leading_report, processed_urls, 10, deadline) for source in custom_sources})
+    raw_sources = []
+    try:
+        for index, source in enumerate(segment_feeds):
+            try:
+                if source.get("type") == "custom":
+                    raw_sources.append((index, source, futures[source['url']].result(timeout=max(0, run_deadline - time.monotonic())), None))
+                    continue
+                response = futures[source['url']].result(timeout=max(0, run_deadline - time.monotonic()))
+                cached = feed_cache.get(source['url']); FEED_CACHE_STATS["requests"] += 1
+                if response.status_code == 304 and cached:
+                    # Unchanged since last run: reuse the parsed items and their cleaned summaries, skipping BeautifulSoup
+                    logger.info(f"  -> {source['name']} not modified, using cached items.")
+                    FEED_CACHE_STATS["not_modified"] += 1; FEED_CACHE_STATS["bytes_saved"] += cached['content_length']; FEED_CACHE_STATS["parse_seconds_saved"] += cached['parse_seconds']
+                    raw_sources.append((index, source, cached['raw_items'], cached))
+                else:
+                    raw_items, parse_seconds = parse_rss_items(response.content)
+                    cache_entry = {"etag": response.headers.get('ETag'), "last_modified": response.headers.get('Last-Modified'), "content_length": len(response.content), "parse_seconds": parse_seconds}
+                    raw_sources.append((index, source, raw_items, cache_entry))
+            except FuturesTimeoutError: logger.error(f"Skipping {source['name']}: run deadline of {deadline}s exceeded.")
+            except Exception as e: logger.error(f"Failed to scrape RSS feed {source['name']}: {e}")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        if own_session: session.close()
+    # Only unprocessed items are cleaned, in one batched spaCy pass, and summaries cleaned on earlier runs come from the feed cache,
+    # so a run where every item has already been published never loads the spaCy model
+    raw_sources.sort(key=lambda raw_source: raw_source[0])  # Feed order, as a sequential run would produce
+    source_summaries = [dict(cache_entry.get('summaries', {})) if cache_entry else {} for _, _, _, cache_entry in raw_sources]
+    pending = [(summaries, item) for (_, _, raw_items, _), summaries in zip(raw_sources, source_summaries) for item in raw_items if item['link'] not in processed_urls and item['link'] not in summaries]
+    if pending:
+        for (summaries, item), summary in zip(pending, clean_summary_texts([item['raw_summary'] for _, item in pending])): summaries[item['link']] = summary
+    all_headlines = []
+    for (index, source, raw_items, cache_entry), summaries in zip(raw_sources, source_summaries):
+        for item in raw_items:
+            summary = summaries.get(item['link'])
+            if item['link'] in processed_urls or summary is None: continue
+            if (summary if source.get("type") == "custom" else 50 < len(summary) < 600):
+                all_headlines.append({ "title": item['title'], "link": item['link'], "summary": summary })
+                if source.get("type") == "custom": logger.info(f"  -> Scraped: {item['title'][:50]}...")
+        if cache_entry is not None:
+            links = {item['link'] for item in raw_items}
+            feed_cache[source['url']] = dict(cache_entry, raw_items=raw_items, summaries={link: summary for link, summary in summaries.items() if link in links})
+    try: save_feed_cache(feed_cache)
+    except OSError as e: logger.warning(f"Could not save feed cache: {e}")
+    logger.info(f"Feed cache: {FEED_CACHE_STATS['not_modified']}/{FEED_CACHE_STATS['requests']} feeds not modified, {FEED_CACHE_STATS['bytes_saved']} bytes and {FEED_CACHE_STATS['parse_seconds_saved']:.2f}s of parsing saved.")
     unique_headlines = list({item['link']: item for item in all_headlines}.values())
     if not unique_headlines: logger.warning("Could not find any new, unprocessed headlines."); return []
     random.shuffle(unique_headlines)
-    return unique_headlines[:HEADLINES_LIMIT]
+    selected = select_headlines(unique_headlines, story_index)
+    if not selected: logger.warning("Every new headline is a near-duplicate of a published story.")
+    return selected
 def search_unsplash_for_image(query):
     logger.info(f"Searching Unsplash for: '{query}'")
     headers = {"Authorization": f"Client-ID {UNSPLASH_API_KEY}"}
     params = {"query": query, "orientation": "portrait", "per_page": 1}
     try:
-        response = requests.get("https://api.unsplash.com/search/photos", headers=headers, params=params, timeout=15)
+        response = requests.get(UNSPLASH_SEARCH_URL, headers=headers, params=params, timeout=15)
         response.raise_for_status()
         data = response.json()
         if data['results']: return data['results'][0]['urls']['regular']
         else: return None
     except Exception as e: logger.error(f"Unsplash API request failed: {e}"); return None
-def create_clip_asset(summary, original_headline, output_path):
-    logger.info(f"Creating visual asset for: {original_headline}")
-    doc = NLP_MODEL(original_headline)
+def get_image_query(original_headline):
+    doc = nlp_docs([original_headline], "headline")[0]
     query_parts = [token.text for token in doc if token.pos_ in ['PROPN', 'NOUN'] and not token.is_stop and len(token.text) > 3]
-    query = " ".join(query_parts) if query_parts else original_headline
-    image_url = search_unsplash_for_image(query)
-    TEXT_AREA_HEIGHT, IMAGE_AREA_HEIGHT = 1100, VIDEO_HEIGHT - 1100
-    canvas = Image.new('RGB', (VIDEO_WIDTH, VIDEO_HEIGHT), color='#181818'); draw = ImageDraw.Draw(canvas)
-    font_headline = ImageFont.truetype(FONT_PATH, 90)
-    font_summary = ImageFont.truetype(FONT_PATH, 60)
-    y_after_headline = draw_multiline_text(draw, original_headline, font_headline, 980, 150, '#FFFFFF')
-    draw_multiline_text(draw, summary, font_summary, 950, y_after_headline + 60, '#CCCCCC')
-    if image_url:
+    return " ".join(query_parts) if query_parts else original_headline
+def prepare_clip_image(image_bytes):
+    # Crops a downloaded image to the card's image area once, on the download thread; the JPEG is what gets cached and composed
+    from PIL import Image
+    with Image.open(io.BytesIO(image_bytes)) as image: cropped_image = crop_to_fill(image.convert("RGB"), VIDEO_WIDTH, IMAGE_AREA_HEIGHT)
+    buffer = io.BytesIO(); cropped_image.save(buffer, format="JPEG", quality=IMAGE_JPEG_QUALITY)
+    return buffer.getvalue()
+def download_clip_image(query, image_cache=None):
+    # Network stage: Unsplash search plus image download (each skipped on a cache hit); returns the cropped JPEG bytes or None
+    image_url = image_cache.get_url(query) if image_cache else None
+    if image_url is None:
+        image_url = search_unsplash_for_image(query)
+        if image_url and image_cache: image_cache.put_url(query, image_url)
+    if not image_url: logger.warning("Could not find a suitable image from Unsplash for this clip."); return None
+    cached_image = image_cache.get_image(image_url) if image_cache else None
+    if cached_image is not None: logger.info(f"Using cached image for '{query}'."); return cached_image
+    try:
+        image_response = requests.get(image_url, timeout=15, headers={'User-Agent': USER_AGENT})
+        image_response.raise_for_status()
+        image_bytes = prepare_clip_image(image_response.content)
+    except Exception as e: logger.error(f"Failed to download image {image_url}: {e}"); return None
+    if image_cache: image_cache.put_image(image_url, image_bytes)
+    return image_bytes
+@functools.lru_cache(maxsize=None)
+def card_template():
+    # Static card background, rendered once per process
+    from PIL import Image
+    return Image.new('RGB', (VIDEO_WIDTH, VIDEO_HEIGHT), color=CARD_BACKGROUND)
+def card_canvas():
+    # One compose buffer per process, reset from the template for every clip (a worker composes one clip at a time)
+    global CARD_CANVAS
+    if CARD_CANVAS is None: CARD_CANVAS = card_template().copy()
+    else: CARD_CANVAS.paste(card_template())
+    return CARD_CANVAS
+def card_path(temp_dir, name): return os.path.join(temp_dir, f"{name}.{'rgb' if CARD_FORMAT == 'raw' else 'png'}")
+def save_card(canvas, output_path):
+    if output_path.endswith('.rgb'):
+        with open(output_path, 'wb') as f: f.write(canvas.tobytes())
+    else: canvas.save(output_path, compress_level=CARD_PNG_COMPRESS_LEVEL)
+def load_card(path):
+    from PIL import Image
+    if path.endswith('.rgb'):
+        with open(path, 'rb') as f: return Image.frombytes('RGB', (VIDEO_WIDTH, VIDEO_HEIGHT), f.read())
+    with Image.open(path) as image: return image.convert('RGB')
+def card_input_args(path):
+    # ffmpeg input options that loop a composed card as a still video stream
+    if path.endswith('.rgb'): return ['-stream_loop', '-1', '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f"{VIDEO_WIDTH}x{VIDEO_HEIGHT}", '-i', path]
+    return ['-loop', '1', '-i', path]
+def compose_clip_asset(summary, original_headline, image_bytes, output_path, font_path):
+    # CPU stage: pure PIL work on plain arguments, so it can run in a worker process. Returns its compose/save timings.
+    from PIL import Image, ImageDraw
+    start = time.perf_counter()
+    canvas = card_canvas(); draw = ImageDraw.Draw(canvas)
+    font_headline, headline_lines, summary_lines = fit_headline(original_headline, summary, font_path)
+    y_after_headline = draw_multiline_text(draw, original_headline, font_headline, HEADLINE_MAX_WIDTH, HEADLINE_TOP, '#FFFFFF', headline_lines)
+    draw_multiline_text(draw, summary, load_font(font_path, SUMMARY_FONT_SIZE), SUMMARY_MAX_WIDTH, y_after_headline + SUMMARY_GAP, '#CCCCCC', summary_lines)
+    if image_bytes:
         try:
-            image_response = requests.get(image_url, stream=True, timeout=15, headers={'User-Agent': USER_AGENT})
-            image_response.raise_for_status()
-            article_image = Image.open(image_response.raw).convert("RGB")
-            cropped_image = crop_to_fill(article_image, VIDEO_WIDTH, IMAGE_AREA_HEIGHT)
-            canvas.paste(cropped_image, (0, TEXT_AREA_HEIGHT)); logger.info(f"Successfully attached image from Unsplash.")
-        except Exception as e: logger.error(f"Failed to process image {image_url}: {e}")
-    else: logger.warning("Could not find a suitable image from Unsplash for this clip.")
-    canvas.save(output_path); return True
+            article_image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+            # Images from download_clip_image are already cropped to the image area
+            if article_image.size != (VIDEO_WIDTH, IMAGE_AREA_HEIGHT): article_image = crop_to_fill(article_image, VIDEO_WIDTH, IMAGE_AREA_HEIGHT)
+            canvas.paste(article_image, (0, TEXT_AREA_HEIGHT)); logger.info(f"Successfully attached image from Unsplash.")
+        except Exception as e: logger.error(f"Failed to process image for '{original_headline[:60]}': {e}")
+    composed = time.perf_counter()
+    save_card(canvas, output_path)
+    return {"compose_seconds": composed - start, "save_seconds": time.perf_counter() - composed}
+def fetch_and_compose_clip_asset(query, summary, original_headline, output_path, cpu_pool, image_cache):
+    # Runs on the I/O pool: each clip's composition is queued the moment its own image arrives, so text rendering for one clip
+    # overlaps the downloads of the others instead of waiting on them in order
+    return cpu_pool.submit(compose_clip_asset, summary, original_headline, download_clip_image(query, image_cache), output_path, FONT_PATH)
+def mp3_duration(path):
+    # Duration from the MPEG audio frame headers (Xing/Info frame count when present), so no ffprobe process is needed per clip
+    with open(path, 'rb') as f: data = f.read()
+    pos = 0
+    if data[:3] == b'ID3' and len(data) >= 10:
+        pos = 10 + ((data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F))
+    total_samples, sample_rate, first_frame = 0, None, True
+    while pos + 4 <= len(data):
+        header = int.from_bytes(data[pos:pos + 4], 'big')
+        version_bits, layer_bits, bitrate_index, rate_index = (header >> 19) & 3, (header >> 17) & 3, (header >> 12) & 15, (header >> 10) & 3
+        if (header >> 21) != 0x7FF or version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or rate_index == 3:
+            pos += 1; continue  # Not a frame header: resync byte by byte
+        mpeg1, layer = version_bits == 3, 4 - layer_bits
+        bitrate = MP3_BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+        sample_rate = MP3_SAMPLE_RATES[rate_index] >> {3: 0, 2: 1, 0: 2}[version_bits]
+        samples_per_frame = 384 if layer == 1 else 1152 if (layer == 2 or mpeg1) else 576
+        padding = (header >> 9) & 1
+        frame_length = (12 * bitrate // sample_rate + padding) * 4 if layer == 1 else samples_per_frame // 8 * bitrate // sample_rate + padding
+        if first_frame and layer == 3:
+            first_frame = False
+            side_info = (32 if ((header >> 6) & 3) != 3 else 17) if mpeg1 else (17 if ((header >> 6) & 3) != 3 else 9)
+            tag_pos = pos + 4 + side_info
+            if data[tag_pos:tag_pos + 4] in (b'Xing', b'Info') and int.from_bytes(data[tag_pos + 4:tag_pos + 8], 'big') & 1:
+                return int.from_bytes(data[tag_pos + 8:tag_pos + 12], 'big') * samples_per_frame / sample_rate
+        total_samples += samples_per_frame; pos += frame_length
+    if not sample_rate: raise ValueError(f"No MPEG audio frames found in {path}")
+    return total_samples / sample_rate
 def check_ffmpeg():
     return shutil.which("ffmpeg")
 
 # --- THIS FUNCTION IS MODIFIED TO USE THE LLM ---
 def create_video_clips(news_items, temp_dir, llm_client):
+    # Pipelined: image search/download (through the persistent ImageCache) runs on an I/O pool and TTS on the shared TTS loop, PIL composition runs on a process pool
+    # as soon as each clip's image arrives, and results are collected in news_items order. Workers are spawned, not forked,
+    # because the TTS loop thread is already running. With only a few clips, spawning interpreters costs more than the ~25 ms
+    # of compositing per card, so they are composed in-process on a single thread (one thread: card_canvas is shared).
     clips_data = []
-    for i, item in enumerate(news_items):
-        original_headline, summary = item['title'], item['summary']
-        logger.info(f"--- Processing clip {i+1}/{len(news_items)}: {original_headline[:60]}... ---")
-        visual_path = os.path.join(temp_dir, f"visual_{i}.png"); audio_path = os.path.join(temp_dir, f"audio_{i}.mp3")
-        
-        # Get the professional script from the LLM
-        narration_text = get_llm_script(original_headline, summary, llm_client)
-        
-        # We pass the original summary to create_clip_asset to keep the on-screen text
-        if not create_clip_asset(summary, original_headline, visual_path): continue
-        if not generate_audio(narration_text, audio_path): continue
-        
-        try:
-            ffprobe_cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', audio_path]
-            result = subprocess.run(ffprobe_cmd, capture_output=True, text=True, check=True)
-            audio_duration = float(result.stdout.strip())
-            final_duration = max(MIN_CLIP_DURATION, audio_duration + 1.5)
-            clips_data.append({"visual_path": visual_path, "audio_path": audio_path, "duration": final_duration, "url": item['link'], "title": original_headline})
-        except Exception as e: logger.error(f"Failed to process audio for clip: {e}")
+    visual_paths = [card_path(temp_dir, f"visual_{i}") for i in range(len(news_items))]; audio_paths = [os.path.join(temp_dir, f"audio_{i}.mp3") for i in range(len(news_items))]
+    queries = [get_image_query(item['title']) for item in news_items]  # spaCy stays on this thread
+    # The I/O pool is entered last so it shuts down first: its tasks still submit to the process pool
+    if len(news_items) <= CLIP_INPROCESS_MAX: cpu_pool = ThreadPoolExecutor(max_workers=1)
+    else: cpu_pool = ProcessPoolExecutor(max_workers=min(CLIP_CPU_WORKERS, len(news_items)), mp_context=multiprocessing.get_context("spawn"))
+    with closing(ImageCache()) as image_cache, cpu_pool, ThreadPoolExecutor(max_workers=CLIP_IO_WORKERS) as io_pool:
+        # We pass the original summary to the visual to keep the on-screen text
+        visual_futures = [io_pool.submit(fetch_and_compose_clip_asset, query, item['summary'], item['title'], visual_path, cpu_pool, image_cache) for query, item, visual_path in zip(queries, news_items, visual_paths)]
+        # Get the professional scripts from the LLM while the images download; each clip's TTS starts as soon as its own script is ready
+        tts_service = get_tts_service(); audio_futures = [None] * len(news_items)
+        def synthesize(index, narration_text): audio_futures[index] = tts_service.submit(narration_text, audio_paths[index])
+        get_llm_scripts(news_items, llm_client, on_script=synthesize)
+        for i, item in enumerate(news_items):
+            original_headline = item['title']
+            logger.info(f"--- Processing clip {i+1}/{len(news_items)}: {original_headline[:60]}... ---")
+            try: card_timings = visual_futures[i].result().result()
+            except Exception as e: logger.error(f"Failed to create visual for clip {i+1}: {e}"); continue
+            try: audio_result = audio_futures[i].result()
+            except Exception as e: logger.error(f"Error generating audio: {e}"); continue
+            visual_path, audio_path = visual_paths[i], audio_paths[i]
+            
+            try:
+                audio_duration = mp3_duration(audio_path)
+                final_duration = max(MIN_CLIP_DURATION, audio_duration + 1.5)
+                clips_data.append({"visual_path": visual_path, "audio_path": audio_path, "duration": final_duration, "url": item['link'], "title": original_headline, "word_timings": audio_result["words"], "compose_seconds": card_timings["compose_seconds"] + card_timings["save_seconds"]})
+            except Exception as e: logger.error(f"Failed to process audio for clip: {e}")
     return clips_data
 
-def create_outro_clip(temp_dir, ffmpeg_path, gif_path):
+OUTRO_DURATION, OUTRO_TEXT, OUTRO_CACHE_DIR = 5, "For hourly updates on latest news, please like and subscribe.", "outro_cache"
+def create_outro_assets(temp_dir):
     outro_audio_path = os.path.join(temp_dir, "outro_audio.mp3")
     outro_image_path = os.path.join(temp_dir, "outro_image.png")
-    outro_base_video_path = os.path.join(temp_dir, "outro_base.mp4")
-    final_outro_path = os.path.join(temp_dir, "outro_final.mp4")
-    outro_duration = 5
-    outro_text = "For hourly updates on latest news, please like and subscribe."
-    if not generate_audio(outro_text, outro_audio_path): raise Exception("Failed to generate outro audio.")
+    if not generate_audio(OUTRO_TEXT, outro_audio_path): raise Exception("Failed to generate outro audio.")
+    from PIL import Image, ImageDraw
     canvas = Image.new('RGB', (VIDEO_WIDTH, VIDEO_HEIGHT), color='#1A1A1A')
     draw = ImageDraw.Draw(canvas)
-    font_large = ImageFont.truetype(FONT_PATH, 150); font_small = ImageFont.truetype(FONT_PATH, 60)
+    font_large = load_font(FONT_PATH, 150); font_small = load_font(FONT_PATH, 60)
     draw.text((VIDEO_WIDTH / 2, 350), "LIKE", font=font_large, fill='#FFFFFF', anchor="ms")
     draw.text((VIDEO_WIDTH / 2, 500), "& SUBSCRIBE", font=font_large, fill='#FFFFFF', anchor="ms")
     draw.text((VIDEO_WIDTH / 2, 620), "For Hourly News Updates!", font=font_small, fill='#CCCCCC', anchor="ms")
     canvas.save(outro_image_path)
-    cmd_base = [ffmpeg_path, '-loop', '1', '-i', outro_image_path, '-i', outro_audio_path, '-c:v', 'libx264', '-c:a', 'aac', '-b:a', '192k', '-pix_fmt', 'yuv420p', '-t', str(outro_duration), '-y', outro_base_video_path]
-    subprocess.run(cmd_base, check=True, capture_output=True, text=True)
-    overlay_x, overlay_y = "(W-w)/2", "(H-h)/2 + 250"
-    cmd_overlay = [ffmpeg_path, '-i', outro_base_video_path, '-i', gif_path, '-filter_complex', f"[1:v]scale=450:-1[gif];[0:v][gif]overlay={overlay_x}:{overlay_y}:shortest=1", '-c:a', 'copy', '-y', final_outro_path]
-    subprocess.run(cmd_overlay, check=True, capture_output=True, text=True)
+    return outro_image_path, outro_audio_path
+def clip_encode_args(threads, preset=None):
+    # Shared by clips and the outro so the concat demuxer can stream-copy them together
+    return ['-c:v', 'libx264'] + (['-preset', preset] if preset else []) + ['-threads', str(threads), '-c:a', 'aac', '-b:a', '192k', '-pix_fmt', 'yuv420p', '-r', str(FPS)]
+def file_digest(path):
+    with open(path, 'rb') as f: return hashlib.sha256(f.read()).hexdigest()
+def create_outro_clip(temp_dir, ffmpeg_path, gif_path):
+    # The outro only changes with its text, voice, font, GIF or encode settings, so the finished MP4 is cached under a hash of those
+    encode_args = clip_encode_args(RENDER_THREADS_PER_JOB, KEN_BURNS_PRESETS[KEN_BURNS_PRESET][1] if KEN_BURNS_ENGINE == "frames" else None)
+    overlay_filter = "[2:v]scale=450:-1[gif];[0:v][gif]overlay=(W-w)/2:(H-h)/2 + 250:shortest=1[v]"
+    key = hashlib.sha256(json.dumps({"text": OUTRO_TEXT, "voice": VOICE, "seed": TTS_SEED, "font": file_digest(FONT_PATH), "gif": file_digest(gif_path), "size": [VIDEO_WIDTH, VIDEO_HEIGHT], "duration": OUTRO_DURATION, "filter": overlay_filter, "encode": encode_args}, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    os.makedirs(OUTRO_CACHE_DIR, exist_ok=True)
+    final_outro_path = os.path.abspath(os.path.join(OUTRO_CACHE_DIR, f"outro_{key}.mp4"))
+    if os.path.exists(final_outro_path): logger.info(f"Using cached outro clip '{final_outro_path}'."); return final_outro_path
+    outro_image_path, outro_audio_path = create_outro_assets(temp_dir)
+    # Encoded next to its final name (same filesystem) so os.replace publishes it atomically; the dot prefix keeps it out of the sweep below
+    tmp_path = os.path.join(OUTRO_CACHE_DIR, f".outro_{key}.{os.getpid()}.{threading.get_ident()}.mp4")
+    cmd = [ffmpeg_path, '-framerate', str(FPS), '-loop', '1', '-t', str(OUTRO_DURATION), '-i', outro_image_path, '-i', outro_audio_path, '-i', gif_path, '-filter_complex', overlay_filter, '-map', '[v]', '-map', '1:a', '-t', str(OUTRO_DURATION)] + encode_args + ['-y', tmp_path]
+    try: subprocess.run(cmd, check=True, capture_output=True, text=True)
+    except BaseException:
+        try: os.remove(tmp_path)
+        except FileNotFoundError: pass
+        raise
+    os.replace(tmp_path, final_outro_path)
+    # Outros built for older inputs can never be hit again; newer ones may belong to an overlapping run and are left alone
+    try: built_at = os.path.getmtime(final_outro_path)
+    except FileNotFoundError: return final_outro_path
+    for name in os.listdir(OUTRO_CACHE_DIR):
+        path = os.path.join(OUTRO_CACHE_DIR, name)
+        if not (name.startswith("outro_") and name.endswith(".mp4")) or path == final_outro_path: continue
+        try:
+            if os.path.getmtime(path) < built_at: os.remove(path)
+        except FileNotFoundError: pass
     return final_outro_path
-def compile_final_video(clips_data, output_path, ffmpeg_path):
-    if not clips_data: return False
-    temp_dir = os.path.dirname(clips_data[0]["visual_path"]); concat_list_path = os.path.join(temp_dir, "concat_list.txt"); clip_files = []
+def ken_burns_trajectory(effect_index, n_frames, width, height):
+    # Crop boxes (left, top, right, bottom) in source pixels for each output frame, starting from zoompan's initial zoom=1, x=y=0
+    zoom_step, x_step, y_step = KEN_BURNS_MOTIONS[effect_index]; zoom, x, y = 1.0, 0.0, 0.0; boxes = []
+    for _ in range(n_frames):
+        zoom = min(max(zoom_step(zoom), 1.0), 10.0)
+        x = min(max(x_step(x, zoom), 0.0), 1 - 1 / zoom); y = min(max(y_step(y, zoom), 0.0), 1 - 1 / zoom)
+        boxes.append((x * width, y * height, (x + 1 / zoom) * width, (y + 1 / zoom) * height))
+    return boxes
+def ken_burns_frames(source, effect_index, n_frames, preset=None):
+    # Yields raw RGB frames from one decoded source; consecutive identical boxes (static effects, clamped pans) reuse the last frame
+    from PIL import Image
+    resample = getattr(Image.Resampling, KEN_BURNS_PRESETS[preset or KEN_BURNS_PRESET][0].upper())
+    last_box, frame = None, None
+    for box in ken_burns_trajectory(effect_index, n_frames, source.width, source.height):
+        if box != last_box: frame = source.resize((VIDEO_WIDTH, VIDEO_HEIGHT), resample, box=box).tobytes(); last_box = box
+        yield frame
+def pipe_frames_to_ffmpeg(cmd, frames):
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        for frame in frames: proc.stdin.write(frame)
+    except BrokenPipeError: pass  # ffmpeg exited early; its stderr says why
+    finally: proc.stdin.close()
+    stderr = proc.stderr.read().decode('utf-8', 'replace'); proc.wait()
+    if proc.returncode: raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=stderr)
+def render_clip(clip, clip_path, effect_index, ffmpeg_path, threads):
+    # Returns the clip path and its encode time
+    start = time.perf_counter()
+    if KEN_BURNS_ENGINE == "frames": return render_clip_frames(clip, clip_path, effect_index, ffmpeg_path, threads), time.perf_counter() - start
+    filter_str = f"scale={VIDEO_WIDTH}*2:-1,{KEN_BURNS_EFFECTS[effect_index]}:s={VIDEO_WIDTH}x{VIDEO_HEIGHT}:fps={FPS}"
+    # A fixed thread count keeps x264's output identical run to run regardless of how many clips render at once
+    cmd = [ffmpeg_path] + card_input_args(clip['visual_path']) + ['-i', clip['audio_path'], '-filter_complex_threads', '1', '-filter_complex', f"[0:v]{filter_str}[v]", '-map', '[v]', '-map', '1:a', '-t', str(clip['duration'])] + clip_encode_args(threads) + ['-y', clip_path]
+    subprocess.run(cmd, check=True, capture_output=True, text=True)
+    return clip_path, time.perf_counter() - start
+def render_clip_frames(clip, clip_path, effect_index, ffmpeg_path, threads):
+    source = load_card(clip['visual_path'])
+    cmd = [ffmpeg_path, '-v', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f"{VIDEO_WIDTH}x{VIDEO_HEIGHT}", '-r', str(FPS), '-i', '-', '-i', clip['audio_path'], '-map', '0:v', '-map', '1:a', '-t', str(clip['duration'])] + clip_encode_args(threads, KEN_BURNS_PRESETS[KEN_BURNS_PRESET][1]) + ['-y', clip_path]
+    pipe_frames_to_ffmpeg(cmd, ken_burns_frames(source, effect_index, math.ceil(clip['duration'] * FPS)))
+    return clip_path
+def compile_final_video_graph(clips_data, output_path, ffmpeg_path):
+    # RENDER_MODE "graph": one ffmpeg process and one filter_complex for every clip, every audio track and the outro overlay,
+    # so there are no intermediate MP4s, no outro re-encode and x264 gets all threads on a single stream.
+    # Audio is padded/trimmed to each clip's frame count, so the separate video and audio concats stay in sync.
+    temp_dir = os.path.dirname(clips_data[0]["visual_path"])
+    effects = [(random.Random(f"{RENDER_SEED}:{i}") if RENDER_SEED is not None else random).choice(range(len(KEN_BURNS_EFFECTS))) for i in range(len(clips_data))]
+    frame_counts = [math.ceil(clip['duration'] * FPS) for clip in clips_data]
+    inputs, filters, video_labels, audio_labels = [], [], [], []
+    def add_input(*args): inputs.extend(args); return inputs.count('-i') - 1
+    if KEN_BURNS_ENGINE == "frames":
+        stream = add_input('-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f"{VIDEO_WIDTH}x{VIDEO_HEIGHT}", '-r', str(FPS), '-i', '-')
+        filters.append(f"[{stream}:v]format=yuv420p,setsar=1[vclips]"); video_labels.append("[vclips]")
     for i, clip in enumerate(clips_data):
-        clip_path = os.path.join(temp_dir, f"clip_{i}.mp4")
-        chosen_effect = random.choice(KEN_BURNS_EFFECTS)
-        filter_str = f"scale={VIDEO_WIDTH}*2:-1,{chosen_effect}:s={VIDEO_WIDTH}x{VIDEO_HEIGHT}:fps={FPS}"
-        cmd = [ffmpeg_path, '-loop', '1', '-i', clip['visual_path'], '-i', clip['audio_path'], '-filter_complex', f"[0:v]{filter_str}[v]", '-map', '[v]', '-map', '1:a', '-t', str(clip['duration']), '-c:v', 'libx264', '-c:a', 'aac', '-b:a', '192k', '-pix_fmt', 'yuv420p', '-r', str(FPS), '-y', clip_path]
-        try:
-            logger.info(f"Assembling video for clip {i+1}...")
-            subprocess.run(cmd, check=True, capture_output=True, text=True)
-            clip_files.append(clip_path)
-        except subprocess.CalledProcessError as e: logger.error(f"Error creating video segment {i}: {e.stderr}"); return False
-    with open(concat_list_path, 'w') as f:
-        for clip_file in clip_files: f.write(f"file '{os.path.abspath(clip_file)}'\n")
+        if KEN_BURNS_ENGINE != "frames":
+            stream = add_input('-framerate', str(FPS), '-t', str(frame_counts[i] / FPS), *card_input_args(clip['visual_path']))
+            filters.append(f"[{stream}:v]scale={VIDEO_WIDTH}*2:-1,{KEN_BURNS_EFFECTS[effects[i]]}:s={VIDEO_WIDTH}x{VIDEO_HEIGHT}:fps={FPS},trim=end_frame={frame_counts[i]},setpts=PTS-STARTPTS,format=yuv420p,setsar=1[v{i}]")
+            video_labels.append(f"[v{i}]")
+        stream = add_input('-i', clip['audio_path'])
+        filters.append(f"[{stream}:a]apad,atrim=end={frame_counts[i] / FPS},asetpts=PTS-STARTPTS[a{i}]"); audio_labels.append(f"[a{i}]")
     if os.path.exists(OUTRO_GIF_NAME):
         try:
-            logger.info(f"Creating 'Like & Subscribe' outro clip...")
-            outro_clip_path = create_outro_clip(temp_dir, ffmpeg_path, OUTRO_GIF_NAME)
-            with open(concat_list_path, 'a') as f: f.write(f"file '{os.path.abspath(outro_clip_path)}'\n")
+            logger.info(f"Creating 'Like & Subscribe' outro assets...")
+            outro_image_path, outro_audio_path = create_outro_assets(temp_dir)
+            image_stream = add_input('-framerate', str(FPS), '-loop', '1', '-t', str(OUTRO_DURATION), '-i', outro_image_path)
+            audio_stream = add_input('-i', outro_audio_path); gif_stream = add_input('-i', OUTRO_GIF_NAME)
+            filters.append(f"[{gif_stream}:v]scale=450:-1[gif];[{image_stream}:v][gif]overlay=(W-w)/2:(H-h)/2 + 250:shortest=1,fps={FPS},format=yuv420p,setsar=1[voutro]")
+            filters.append(f"[{audio_stream}:a]atrim=end={OUTRO_DURATION},asetpts=PTS-STARTPTS[aoutro]")
+            video_labels.append("[voutro]"); audio_labels.append("[aoutro]")
         except Exception as e: logger.error(f"Failed to create outro clip: {e}")
     else: logger.warning(f"Outro GIF '{OUTRO_GIF_NAME}' not found. Skipping outro.")
+    filters.append(f"{''.join(video_labels)}concat=n={len(video_labels)}:v=1:a=0[v];{''.join(audio_labels)}concat=n={len(audio_labels)}:v=0:a=1[a]")
+    video_preset = ['-preset', KEN_BURNS_PRESETS[KEN_BURNS_PRESET][1]] if KEN_BURNS_ENGINE == "frames" else []
+    cmd = [ffmpeg_path, '-v', 'error'] + inputs + ['-filter_complex', ';'.join(filters), '-map', '[v]', '-map', '[a]', '-c:v', 'libx264'] + video_preset + ['-c:a', 'aac', '-b:a', '192k', '-pix_fmt', 'yuv420p', '-r', str(FPS), '-y', output_path]
+    logger.info(f"Rendering {len(clips_data)} clips in a single ffmpeg filter graph...")
+    start = time.perf_counter()
+    try:
+        if KEN_BURNS_ENGINE == "frames":
+            def clip_frames():
+                for i, clip in enumerate(clips_data): yield from ken_burns_frames(load_card(clip['visual_path']), effects[i], frame_counts[i])
+            pipe_frames_to_ffmpeg(cmd, clip_frames())
+        else: subprocess.run(cmd, check=True, capture_output=True, text=True)
+        logger.info(f"Composed cards in {sum(clip['compose_seconds'] for clip in clips_data):.2f}s, encoded the whole video in {time.perf_counter() - start:.2f}s.")
+        logger.info(f"SUCCESS: Final video compiled at: {output_path}")
+        return True
+    except subprocess.CalledProcessError as e: logger.error(f"FATAL: Error compiling final video: {e.stderr}"); return False
+def compile_final_video(clips_data, output_path, ffmpeg_path):
+    if not clips_data: return False
+    if RENDER_MODE == "graph": return compile_final_video_graph(clips_data, output_path, ffmpeg_path)
+    temp_dir = os.path.dirname(clips_data[0]["visual_path"]); concat_list_path = os.path.join(temp_dir, "concat_list.txt")
+    # Effects are drawn up front (per clip index when seeded) so the result doesn't depend on which encode finishes first
+    effects = [(random.Random(f"{RENDER_SEED}:{i}") if RENDER_SEED is not None else random).choice(range(len(KEN_BURNS_EFFECTS))) for i in range(len(clips_data))]
+    workers = max(1, (os.cpu_count() or 1) // RENDER_THREADS_PER_JOB)
+    logger.info(f"Assembling {len(clips_data)} clips on {workers} ffmpeg workers x {RENDER_THREADS_PER_JOB} threads...")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        clip_futures = [pool.submit(render_clip, clip, os.path.join(temp_dir, f"clip_{i}.mp4"), effects[i], ffmpeg_path, RENDER_THREADS_PER_JOB) for i, clip in enumerate(clips_data)]
+        outro_future = pool.submit(create_outro_clip, temp_dir, ffmpeg_path, OUTRO_GIF_NAME) if os.path.exists(OUTRO_GIF_NAME) else None
+        clip_files = []
+        for i, future in enumerate(clip_futures):
+            try:
+                clip_file, encode_seconds = future.result(); clip_files.append(clip_file)
+                logger.info(f"Clip {i+1}: composed in {clips_data[i]['compose_seconds']:.2f}s, encoded in {encode_seconds:.2f}s.")
+            except subprocess.CalledProcessError as e:
+                logger.error(f"Error creating video segment {i}: {e.stderr}")
+                for pending in clip_futures: pending.cancel()
+                return False
+        outro_clip_path = None
+        if outro_future is None: logger.warning(f"Outro GIF '{OUTRO_GIF_NAME}' not found. Skipping outro.")
+        else:
+            try: outro_clip_path = outro_future.result()
+            except Exception as e: logger.error(f"Failed to create outro clip: {e}")
+    with open(concat_list_path, 'w') as f:
+        for clip_file in clip_files + ([outro_clip_path] if outro_clip_path else []): f.write(f"file '{os.path.abspath(clip_file)}'\n")
     final_cmd = [ffmpeg_path, '-f', 'concat', '-safe', '0', '-i', concat_list_path, '-c', 'copy', '-y', output_path]
     try:
         subprocess.run(final_cmd, check=True, capture_output=True, text=True)
@@ -268,27 +844,52 @@ def compile_final_video(clips_data, output_path, ffmpeg_path):
         return True
     except subprocess.CalledProcessError as e: logger.error(f"FATAL: Error compiling final video: {e.stderr}"); return False
 def crop_to_fill(image, target_width, target_height):
+    from PIL import Image
     target_ratio = target_width / target_height; image_ratio = image.width / image.height
     if image_ratio > target_ratio:
         new_width = int(target_ratio * image.height); left, right = (image.width - new_width) // 2, (image.width + new_width) // 2; top, bottom = 0, image.height
     else:
         new_height = int(image.width / target_ratio); top, bottom = (image.height - new_height) // 2, (image.height + new_height) // 2; left, right = 0, image.width
     return image.crop((left, top, right, bottom)).resize((target_width, target_height), Image.LANCZOS)
-def draw_multiline_text(draw, text, font, max_width, start_y, text_color):
-    words = text.split(); lines = [""]
-    for word in words:
-        test_line = (lines[-1] + " " + word).strip()
-        if draw.textbbox((0, 0), test_line, font=font)[2] <= max_width: lines[-1] = test_line
-        else: lines.append(word)
+@functools.lru_cache(maxsize=None)
+def load_font(font_path, size):
+    from PIL import ImageFont
+    return ImageFont.truetype(font_path, size)
+@functools.lru_cache(maxsize=65536)
+def word_advance(font_path, size, word): return load_font(font_path, size).getlength(word)
+@functools.lru_cache(maxsize=None)
+def line_height(font_path, size): return load_font(font_path, size).getbbox("A")[3] * 1.2
+def layout_lines(text, font, max_width):
+    # Greedy line breaking on cached per-word advances: a line's width is the running sum of its words and spaces, and only a
+    # candidate within the kerning slack of max_width is measured exactly (same ink-box test as draw.textbbox), once
+    space, slack = word_advance(font.path, font.size, " "), font.size * LAYOUT_KERNING_SLACK
+    lines, line, line_width = [], "", 0.0
+    for word in text.split():
+        width = word_advance(font.path, font.size, word)
+        if not line: line, line_width = word, width; continue
+        estimate = line_width + space + width; candidate = f"{line} {word}"
+        if estimate <= max_width - slack or (estimate <= max_width + slack and font.getbbox(candidate)[2] <= max_width): line, line_width = candidate, estimate
+        else: lines.append(line); line, line_width = word, width
+    if line: lines.append(line)
+    return lines
+def draw_multiline_text(draw, text, font, max_width, start_y, text_color, lines=None):
     y = start_y
-    for line in lines:
-        if line: draw.text((VIDEO_WIDTH / 2, y), line, font=font, fill=text_color, anchor="ms"); y += font.getbbox("A")[3] * 1.2
+    for line in lines if lines is not None else layout_lines(text, font, max_width):
+        draw.text((VIDEO_WIDTH / 2, y), line, font=font, fill=text_color, anchor="ms"); y += line_height(font.path, font.size)
     return y
+def fit_headline(headline, summary, font_path):
+    # Shrinks the headline font in HEADLINE_FONT_STEP steps until headline and summary fit the text area (or the minimum size is reached)
+    summary_lines = layout_lines(summary, load_font(font_path, SUMMARY_FONT_SIZE), SUMMARY_MAX_WIDTH)
+    summary_height = len(summary_lines) * line_height(font_path, SUMMARY_FONT_SIZE)
+    for size in range(HEADLINE_FONT_SIZE, HEADLINE_MIN_FONT_SIZE - 1, -HEADLINE_FONT_STEP):
+        headline_lines = layout_lines(headline, load_font(font_path, size), HEADLINE_MAX_WIDTH)
+        if HEADLINE_TOP + len(headline_lines) * line_height(font_path, size) + SUMMARY_GAP + summary_height <= TEXT_AREA_HEIGHT: break
+    return load_font(font_path, size), headline_lines, summary_lines
 def generate_summary_and_hashtags(clips_data, segment_name, output_file):
     logger.info("Generating video description and hashtags...")
-    doc = NLP_MODEL(". ".join(clip['title'] for clip in clips_data))
-    entities = {ent.text.strip() for ent in doc.ents if ent.label_ in ['PERSON', 'ORG', 'GPE']}
-    keywords = {token.text for token in doc if token.pos_ in ['PROPN', 'NOUN'] and not token.is_stop and len(token.text) > 3}
+    docs = nlp_docs([clip['title'] for clip in clips_data], "headline")
+    entities = {ent.text.strip() for doc in docs for ent in doc.ents if ent.label_ in ['PERSON', 'ORG', 'GPE']}
+    keywords = {token.text for doc in docs for token in doc if token.pos_ in ['PROPN', 'NOUN'] and not token.is_stop and len(token.text) > 3}
     buzzwords = list(entities.union(keywords)); random.shuffle(buzzwords)
     description = f"Today's {segment_name} News Briefing:\n\n"
     for clip in clips_data: description += f"📌 {clip['title']}\n"
@@ -300,31 +901,143 @@ def generate_summary_and_hashtags(clips_data, segment_name, output_file):
     with open(output_file, 'w', encoding='utf-8') as f: f.write(description)
     logger.info(f"Successfully saved description and hashtags to '{output_file}'")
 
+BENCHMARK_EXIT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter(); import news; imported = time.perf_counter()
+feed_url, links = sys.argv[1], sys.argv[2:]
+news.SEGMENT_SOURCES = {name: [{"name": "Fixture feed", "url": feed_url}] for name in news.SEGMENT_ORDER}
+news.check_ffmpeg = lambda: "ffmpeg"  # The exit-10 path never runs ffmpeg
+history = news.ProcessedUrlHistory(); history.add(links); history.close()
+main_start = time.perf_counter()
+try: news.main(); code = 0
+except SystemExit as e: code = e.code
+done = time.perf_counter()
+print(json.dumps({"code": code, "import_ms": (imported - start) * 1000, "main_ms": (done - main_start) * 1000, "heavy": [name for name in ["spacy", "matplotlib", "playwright", "groq", "edge_tts", "PIL", "bs4"] if name in sys.modules]}))
+"""
+def benchmark_startup(runs=3):
+    # python news.py --benchmark-startup: the cost of a run that finds nothing new. Profiles "import news" with -X importtime, then times
+    # main() down to exit code 10 against a local fixture feed whose items are all already in the processed-URL history
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import news"], capture_output=True, text=True, cwd=script_dir)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line: continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), name.strip(), (len(name) - len(name.lstrip()) - 1) // 2))
+    news_us = next((us for us, name, _ in rows if name == "news"), 0)
+    # Direct imports of news.py, heaviest first
+    top_level = sorted(((us, name) for us, name, depth in rows if depth == 1), reverse=True)[:10]
+    heavy_loaded = [name for name in ["spacy", "matplotlib", "playwright", "groq", "edge_tts", "PIL", "bs4"] if any(row_name == name for _, row_name, _ in rows)]
+    print(f"import news: {news_us / 1000:.1f} ms cumulative")
+    for us, name in top_level: print(f"  {us / 1000:8.1f} ms  {name}")
+    print(f"Heavy modules imported at startup: {', '.join(heavy_loaded) if heavy_loaded else 'none'}")
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    links = [f"https://example.com/story-{i}" for i in range(10)]
+    feed = "<?xml version='1.0'?><rss version='2.0'><channel><title>Fixture</title>" + "".join(f"<item><title>Story {i}</title><link>{link}</link><description>Officials said on Tuesday that story number {i} had developed further overnight, with more details expected later this week.</description></item>" for i, link in enumerate(links)) + "</channel></rss>"
+    class FeedHandler(BaseHTTPRequestHandler):
+        def do_GET(self): self.send_response(200); self.send_header("Content-Type", "application/rss+xml"); self.end_headers(); self.wfile.write(feed.encode('utf-8'))
+        def log_message(self, *args): pass
+    server = HTTPServer(("127.0.0.1", 0), FeedHandler); threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        for run in range(runs):
+            with tempfile.TemporaryDirectory() as run_dir:
+                with open(os.path.join(run_dir, CONFIG_FILE), 'w') as f: f.write("[API_KEYS]\nUNSPLASH_ACCESS_KEY = benchmark\nGROQ_API_KEY = benchmark\n")
+                env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [script_dir, os.environ.get("PYTHONPATH")])))
+                start = time.perf_counter()
+                child = subprocess.run([sys.executable, "-c", BENCHMARK_EXIT_SCRIPT, f"http://127.0.0.1:{server.server_port}/feed.xml"] + links, capture_output=True, text=True, cwd=run_dir, env=env)
+                total_ms = (time.perf_counter() - start) * 1000
+                try: stats = json.loads(child.stdout.strip().splitlines()[-1])
+                except (IndexError, ValueError): print(f"Exit-path run failed:\n{child.stderr[-2000:]}"); return
+                print(f"No-new-articles run {run + 1}: exit {stats['code']} in {total_ms:.0f} ms wall (import {stats['import_ms']:.0f} ms, main {stats['main_ms']:.0f} ms); heavy modules loaded: {', '.join(stats['heavy']) or 'none'}")
+    finally: server.shutdown()
+
+def benchmark_ken_burns(image_path=None, seconds=5):
+    # python news.py --benchmark-kenburns [image]: frames/s of each KEN_BURNS_EFFECTS entry via zoompan vs. the frames engine per preset.
+    # Both feed ffmpeg's null muxer, so x264 is left out; without ffmpeg only the Python frame generation is timed.
+    from PIL import Image
+    ffmpeg_path, n_frames = shutil.which("ffmpeg"), int(seconds * FPS)
+    with tempfile.TemporaryDirectory() as bench_dir:
+        if image_path is None:
+            image_path = os.path.join(bench_dir, "bench.png")
+            Image.effect_noise((VIDEO_WIDTH, VIDEO_HEIGHT), 64).convert('RGB').save(image_path)
+        with Image.open(image_path) as image: source = image.convert('RGB').resize((VIDEO_WIDTH, VIDEO_HEIGHT))
+        print(f"{n_frames} frames per run, ffmpeg: {ffmpeg_path or 'not found (frame generation only)'}")
+        print(f"{'effect':>6}  {'zoompan':>10}" + "".join(f"  {preset:>10}" for preset in KEN_BURNS_PRESETS))
+        for effect_index, effect in enumerate(KEN_BURNS_EFFECTS):
+            row = []
+            if ffmpeg_path:
+                start = time.perf_counter()
+                subprocess.run([ffmpeg_path, '-v', 'error', '-loop', '1', '-i', image_path, '-filter_complex', f"[0:v]scale={VIDEO_WIDTH}*2:-1,{effect}:s={VIDEO_WIDTH}x{VIDEO_HEIGHT}:fps={FPS}[v]", '-map', '[v]', '-frames:v', str(n_frames), '-f', 'null', '-'], check=True)
+                row.append(n_frames / (time.perf_counter() - start))
+            else: row.append(None)
+            for preset in KEN_BURNS_PRESETS:
+                start = time.perf_counter(); frames = ken_burns_frames(source, effect_index, n_frames, preset)
+                if ffmpeg_path: pipe_frames_to_ffmpeg([ffmpeg_path, '-v', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f"{VIDEO_WIDTH}x{VIDEO_HEIGHT}", '-r', str(FPS), '-i', '-', '-f', 'null', '-'], frames)
+                else: sum(1 for _ in frames)
+                row.append(n_frames / (time.perf_counter() - start))
+            print(f"{effect_index:>6}" + "".join(f"  {fps:>6.1f} fps" if fps is not None else f"  {'-':>10}" for fps in row))
+
+def benchmark_layout(headlines_path=None, repeats=20):
+    # python news.py --benchmark-layout [file]: headline layout time, old per-word textbbox loop vs. layout_lines, over one headline
+    # per line of the file, or the headlines stored in the feed cache by previous runs
+    from PIL import Image, ImageDraw, ImageFont
+    if headlines_path:
+        with open(headlines_path, 'r', encoding='utf-8') as f: headlines = [line.strip() for line in f if line.strip()]
+    else: headlines = list(dict.fromkeys(item['title'] for entry in load_feed_cache().values() for item in entry.get('raw_items', [])))
+    if not headlines: print(f"No headlines: pass a file with one headline per line or run once to fill '{FEED_CACHE_FILE}'."); return
+    if not setup_font(): return
+    draw = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+    def textbbox_lines(text, font):
+        lines = [""]
+        for word in text.split():
+            test_line = (lines[-1] + " " + word).strip()
+            if draw.textbbox((0, 0), test_line, font=font)[2] <= HEADLINE_MAX_WIDTH: lines[-1] = test_line
+            else: lines.append(word)
+        return [line for line in lines if line]
+    start = time.perf_counter()
+    for _ in range(repeats): old = [textbbox_lines(headline, ImageFont.truetype(FONT_PATH, HEADLINE_FONT_SIZE)) for headline in headlines]
+    old_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(repeats): new = [layout_lines(headline, load_font(FONT_PATH, HEADLINE_FONT_SIZE), HEADLINE_MAX_WIDTH) for headline in headlines]
+    new_seconds = time.perf_counter() - start
+    shrunk = sum(fit_headline(headline, "", FONT_PATH)[0].size < HEADLINE_FONT_SIZE for headline in headlines)
+    runs = repeats * len(headlines)
+    print(f"{len(headlines)} headlines x {repeats} repeats, font {FONT_PATH}")
+    print(f"  textbbox per word:  {old_seconds / runs * 1e6:8.1f} us/headline")
+    print(f"  layout_lines:       {new_seconds / runs * 1e6:8.1f} us/headline ({old_seconds / new_seconds:.1f}x)")
+    print(f"  identical line breaks: {sum(a == b for a, b in zip(old, new))}/{len(headlines)}; headlines shrunk to fit: {shrunk}")
+
 # --- THIS IS THE MODIFIED MAIN FUNCTION ---
 def main():
+    # Stage 1: cheap checks only. Fonts, spaCy and the LLM client wait until there is something to render.
     ffmpeg_path = check_ffmpeg()
-    if not setup_config() or not setup_font() or not ffmpeg_path or not setup_nlp_model(): sys.exit(1)
-    
-    # Initialize the LLM client
-    llm_client = Groq(api_key=GROQ_API_KEY)
+    if not setup_config() or not ffmpeg_path: sys.exit(1)
     
     current_segment_name, segment_feeds = get_next_segment()
     processed_urls = load_processed_urls()
+    story_index = NearDuplicateIndex(); story_index.prune(HISTORY_TTL_DAYS * 86400)
+    http_session = create_http_session()
     temp_dir = None
     try:
         temp_dir = setup_output_directory()
         output_video_path = os.path.join(os.getcwd(), f"news_{current_segment_name.replace(' ', '_')}.mp4")
-        news_items = scrape_news(segment_feeds, processed_urls)
+        news_items = scrape_news(segment_feeds, processed_urls, http_session, story_index=story_index)
         
         if not news_items:
             logger.info("No new articles found. Exiting with status 10.")
             sys.exit(10)
         
+        # Stage 2: there are new articles, so load the rendering dependencies
+        if not setup_font(): sys.exit(1)
+        from groq import Groq
+        llm_client = Groq(api_key=GROQ_API_KEY)  # Initialize the LLM client
+        nlp_docs([item['title'] for item in news_items], "headline")  # Tag every selected headline in one batch
         clips_data = create_video_clips(news_items, temp_dir, llm_client)
         if clips_data:
             if compile_final_video(clips_data, output_video_path, ffmpeg_path):
                 newly_processed_urls = [clip['url'] for clip in clips_data]
-                save_processed_urls(newly_processed_urls)
+                save_processed_urls(processed_urls, newly_processed_urls)
+                story_index.add([item for item in news_items if item['link'] in newly_processed_urls])
                 generate_summary_and_hashtags(clips_data, current_segment_name, DESCRIPTION_FILE)
         else:
             logger.error("No valid clips were created. Final video not generated.")
@@ -333,9 +1046,14 @@ def main():
         logger.critical(f"A critical error occurred in main: {e}", exc_info=True)
         sys.exit(1)
     finally:
+        http_session.close(); processed_urls.close(); story_index.close()
+        if TTS_SERVICE: TTS_SERVICE.close()
         if temp_dir and os.path.exists(temp_dir):
             shutil.rmtree(temp_dir)
             logger.info(f"Cleaned up temporary directory.")
 
 if __name__ == "__main__":
-    main()
+    if "--benchmark-startup" in sys.argv: benchmark_startup()
+    elif "--benchmark-layout" in sys.argv: benchmark_layout(*sys.argv[sys.argv.index("--benchmark-layout") + 1:][:1])
+    elif "--benchmark-kenburns" in sys.argv: benchmark_ken_burns(*sys.argv[sys.argv.index("--benchmark-kenburns") + 1:][:1])
+    else: main()
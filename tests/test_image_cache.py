@@ -0,0 +1,23 @@
+import os
+
+import news
+
+
+def cached_bytes(cache_dir):
+    return sum(os.path.getsize(os.path.join(cache_dir, name)) for name in os.listdir(cache_dir) if name.endswith(".jpg"))
+
+
+def test_size_limit_ignores_expired_entries(tmp_path):
+    cache_dir = str(tmp_path / "image_cache")
+    cache = news.ImageCache(cache_dir=cache_dir, ttl_seconds=3600, max_bytes=250)
+    try:
+        cache.put_image("http://images.test/old-1", b"o" * 100)
+        cache.put_image("http://images.test/old-2", b"o" * 100)
+        # Age both entries past the TTL
+        cache.conn.execute("UPDATE image_files SET fetched_at = fetched_at - 7200, used_at = used_at - 7200")
+        for i in range(3): cache.put_image(f"http://images.test/new-{i}", b"n" * 100)
+        cache.prune()
+        assert cached_bytes(cache_dir) <= 250
+        assert cache.get_image("http://images.test/old-1") is None
+        assert cache.get_image("http://images.test/new-2") == b"n" * 100
+    finally: cache.close()
@@ -0,0 +1,18 @@
+import json
+import os
+
+import pytest
+
+import news
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "mp3")
+# Durations reported by `ffprobe -show_entries format=duration` for each fixture:
+#   edge_tts_24k_cbr.mp3  24 kHz mono 48 kbit/s CBR MPEG-2 Layer III, no Xing/Info frame (what edge-tts streams)
+#   lame_xing_vbr.mp3     44.1 kHz stereo LAME VBR with a Xing frame and an ID3v2 tag
+#   id3_info_cbr.mp3      24 kHz mono LAME CBR with an Info frame and an ID3v2 tag
+with open(os.path.join(FIXTURE_DIR, "ffprobe_durations.json")) as f: FFPROBE_DURATIONS = json.load(f)
+
+
+@pytest.mark.parametrize("name", sorted(FFPROBE_DURATIONS))
+def test_matches_ffprobe(name):
+    assert abs(news.mp3_duration(os.path.join(FIXTURE_DIR, name)) - FFPROBE_DURATIONS[name]) <= 0.005
@@ -0,0 +1,19 @@
+import news
+
+
+def test_custom_source_checks_history_from_scrape_thread(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    history = news.ProcessedUrlHistory(str(tmp_path / "processed_urls.db"))
+    history.add(["https://leading.test/seen"])
+    index_links = [("Seen story", "https://leading.test/seen"), ("New story", "https://leading.test/new")]
+
+    async def fake_scrape(processed_urls, limit):
+        # Same membership check the real scrape makes on the index page, run on the executor thread
+        return [(title, url, f"Summary of {title}.") for title, url in index_links if url not in processed_urls]
+
+    monkeypatch.setattr(news, "scrape_leading_report_async", fake_scrape)
+    monkeypatch.setattr(news, "clean_summary_texts", lambda texts: list(texts))
+    try:
+        headlines = news.scrape_news([{"name": "The Leading Report", "url": "https://leading.test/", "type": "custom"}], history)
+    finally: history.close()
+    assert [item['link'] for item in headlines] == ["https://leading.test/new"]